@@ -0,0 +1,212 @@
+"""
+Benchmarks of pandas-cat on synthetic categorical datasets.
+
+Every stage (``prepare``, ``handle_missing_values``, pairwise metrics and both
+report templates) is run on datasets of all combinations of the given numbers
+of rows, columns, categories and missing rates.  Wall time is the best of
+``--repeat`` runs, peak memory is measured by ``tracemalloc`` in one more run
+(numpy and pandas buffers included).
+
+Run the suite and save the results::
+
+    python benchmarks/benchmark.py run --out before.json
+    python benchmarks/benchmark.py run --out after.json --rows 10000 1000000 --columns 5 20
+
+Compare two runs; stages slower or using more memory than the threshold are
+listed and the exit code is 1, so the comparison can gate a release::
+
+    python benchmarks/benchmark.py compare before.json after.json --threshold 0.2
+
+The package is imported from ``src`` of this checkout, so running the same
+command in two checkouts compares two versions.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pandas_cat import pandas_cat  # noqa: E402
+
+#: missing value tokens put into the data, all of them are detected by handle_missing_values
+MISSING_TOKENS = np.array(['N/A', 'Unknown', 'NULL', ''], dtype=object)
+
+
+def make_dataset(rows: int, columns: int, cardinality: int, missing_rate: float = 0.0, seed: int = 0):
+    """
+    Return a DataFrame of string categories.
+
+    Odd columns hold intervals like ``'10-19'`` which :meth:`pandas_cat.prepare`
+    orders, even columns hold plain labels.  Frequencies of categories are
+    skewed (Zipf-like) as in real data and ``missing_rate`` of values are
+    replaced by missing value tokens.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, cardinality + 1)
+    weights /= weights.sum()
+    data = {}
+    for j in range(columns):
+        if j % 2:
+            labels = np.array([f'{10 * i}-{10 * i + 9}' for i in range(cardinality)], dtype=object)
+        else:
+            labels = np.array([f'c{j}_{i}' for i in range(cardinality)], dtype=object)
+        values = labels[rng.choice(cardinality, rows, p=weights)]
+        missing = rng.random(rows) < missing_rate
+        values[missing] = MISSING_TOKENS[rng.integers(0, len(MISSING_TOKENS), int(missing.sum()))]
+        data[f'col{j}'] = values
+    return pd.DataFrame(data)
+
+
+def _pairs(df):
+    return list(itertools.combinations(df.columns, 2))
+
+
+def _cramers_all_pairs(df):
+    for column_one, column_two in _pairs(df):
+        pandas_cat._cramers_corrected_stat(pd.crosstab(df[column_one], df[column_two]))
+
+
+def _theils_u_all_pairs(df):
+    for column_one, column_two in _pairs(df):
+        pandas_cat._theils_u(df[column_one], df[column_two])
+
+
+#: stage name -> function run on a fresh copy of the dataset
+STAGES = {
+    'prepare': lambda df: pandas_cat.prepare(df, opts={'verbose': False}),
+    'handle_missing_values': lambda df: pandas_cat.handle_missing_values(df),
+    'cramers_corrected_stat': _cramers_all_pairs,
+    'theils_u': _theils_u_all_pairs,
+    'association_matrix': lambda df: pandas_cat.association_matrix(df, cat_limit=None),
+    'profile_default': lambda df: pandas_cat.profile(df, 'Benchmark', opts={'verbose': False}),
+    'profile_interactive': lambda df: pandas_cat.profile(df, 'Benchmark', template='interactive',
+                                                         opts={'verbose': False}),
+}
+
+
+def measure(stage, df, repeat: int = 3):
+    """Return the best wall time (seconds) of ``repeat`` runs and the peak traced memory (bytes) of a stage."""
+    seconds = []
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        STAGES[stage](data)
+        seconds.append(time.perf_counter() - start)
+    data = df.copy()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        STAGES[stage](data)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak
+
+
+def run(args):
+    stages = args.stages or list(STAGES)
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stages {unknown}, use some of {list(STAGES)}.")
+    results = []
+    # reports are written to ./report, keep them out of the working directory
+    cwd = os.getcwd()
+    out = os.path.abspath(args.out) if args.out else None
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for rows, columns, cardinality, missing_rate in itertools.product(
+                    args.rows, args.columns, args.cardinality, args.missing_rate):
+                dataset = {'rows': rows, 'columns': columns, 'cardinality': cardinality,
+                           'missing_rate': missing_rate}
+                df = make_dataset(rows, columns, cardinality, missing_rate, seed=args.seed)
+                for stage in stages:
+                    seconds, peak = measure(stage, df, args.repeat)
+                    results.append({'stage': stage, **dataset, 'seconds': seconds, 'peak_bytes': peak})
+                    print(f"{stage:24} rows={rows:<9} columns={columns:<4} cardinality={cardinality:<5} "
+                          f"missing={missing_rate:<5} {seconds:9.3f} s {peak / 2**20:9.1f} MB", flush=True)
+        finally:
+            os.chdir(cwd)
+    report = {
+        'meta': {'pandas_cat': pandas_cat.version_string, 'python': platform.python_version(),
+                 'pandas': pd.__version__, 'numpy': np.__version__, 'platform': platform.platform(),
+                 'repeat': args.repeat, 'seed': args.seed},
+        'results': results,
+    }
+    if out:
+        with open(out, 'w') as f:
+            json.dump(report, f, indent=1)
+    return report
+
+
+def compare(args):
+    def load(path):
+        with open(path) as f:
+            return {(r['stage'], r['rows'], r['columns'], r['cardinality'], r['missing_rate']): r
+                    for r in json.load(f)['results']}
+
+    before = load(args.before)
+    after = load(args.after)
+    regressions = 0
+    print(f"{'stage':24} {'rows':>9} {'cols':>4} {'card':>5} {'miss':>5} "
+          f"{'time before':>11} {'after':>9} {'ratio':>6} {'MB before':>9} {'after':>9} {'ratio':>6}")
+    for key in sorted(before.keys() & after.keys(), key=str):
+        old, new = before[key], after[key]
+        time_ratio = new['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        memory_ratio = new['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else float('inf')
+        # differences below the noise floor are not regressions whatever the ratio
+        slower = time_ratio > 1 + args.threshold and new['seconds'] - old['seconds'] > args.min_seconds
+        larger = memory_ratio > 1 + args.threshold and new['peak_bytes'] - old['peak_bytes'] > args.min_bytes
+        flag = ' <-- slower' * slower + ' <-- more memory' * larger
+        regressions += slower or larger
+        print(f"{key[0]:24} {key[1]:>9} {key[2]:>4} {key[3]:>5} {key[4]:>5} "
+              f"{old['seconds']:11.3f} {new['seconds']:9.3f} {time_ratio:6.2f} "
+              f"{old['peak_bytes'] / 2**20:9.1f} {new['peak_bytes'] / 2**20:9.1f} {memory_ratio:6.2f}{flag}")
+    missing = sorted(before.keys() ^ after.keys(), key=str)
+    if missing:
+        print(f"{len(missing)} results are only in one of the runs and were not compared.")
+    print(f"{regressions} regressions over {args.threshold:.0%}.")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    run_parser.add_argument('--columns', type=int, nargs='+', default=[4, 8])
+    run_parser.add_argument('--cardinality', type=int, nargs='+', default=[10])
+    run_parser.add_argument('--missing-rate', type=float, nargs='+', default=[0.05])
+    run_parser.add_argument('--stages', nargs='+', help=f'stages to run, default all of {list(STAGES)}')
+    run_parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the fastest one is kept')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--out', help='JSON file to write the results to')
+
+    compare_parser = commands.add_parser('compare', help='compare two runs')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=0.2,
+                                help='relative increase reported as a regression (default 0.2)')
+    compare_parser.add_argument('--min-seconds', type=float, default=0.05,
+                                help='smaller time differences are ignored as noise')
+    compare_parser.add_argument('--min-bytes', type=int, default=2**20,
+                                help='smaller memory differences are ignored as noise')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+        return 0
+    return 1 if compare(args) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
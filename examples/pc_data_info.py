@@ -8,13 +8,6 @@ df = pd.read_csv('./accidents.zip',
 # Use only selected columns - longer version
 df=df[['Driver_Age_Band','Driver_IMD','Sex','Journey','Hit_Objects_in','Hit_Objects_off','Casualties','Severity','Area','Vehicle_Age','Road_Type','Speed_limit','Light','Vehicle_Location','Vehicle_Type']]
 
-df = pandas_cat.prepare(df)
-
-s = ""                          
-for column in df:
-    s = f"Column {column}:"
-    dfc = pd.get_dummies(df[column])
-    for col2 in dfc:
-        s += f"{col2} "
-    print(s)
+# verbose 'debug' also lists categories of each column
+df = pandas_cat.prepare(df, opts={"verbose": "debug"})
 
@@ -1,22 +1,1265 @@
+import argparse
+import asyncio
 import base64
 import copy
+import functools
+import gzip
+import hashlib
+import html
+import itertools
+import json
+import logging
 import re
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
 from io import BytesIO
 
 import pandas
 import os
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 
 from jinja2 import Environment, FileSystemLoader
 
-from cleverminer import cleverminer
-import scipy.stats as ss
 from pandas.api.types import CategoricalDtype
 
+# matplotlib, seaborn, scipy and cleverminer take seconds to import, they are imported
+# by the functions which use them, so prepare(), missing values and the interactive
+# report do not need them at all
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak resident set size is not traced there
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# pyplot figures are global state, charts are drawn by one thread at a time (see pandas_cat.profile_async)
+_pyplot_lock = threading.RLock()
+
+
+@functools.lru_cache(maxsize=None)
+def _environment(directory: str):
+    """Return the Jinja2 environment of a template directory, created once per process so templates are compiled once."""
+    return Environment(loader=FileSystemLoader(directory))
+
+
+@contextmanager
+def _verbosity(verbose=True):
+    """
+    Show log messages of pandas-cat on stdout during one call.
+
+    ``verbose`` is ``True`` (progress messages), ``False`` (warnings and
+    errors only), ``'debug'`` (also per column and per pair details) or
+    a ``logging`` level, as a number or a name like ``'info'``.  If the
+    application has configured logging, its handlers are used and only the
+    level of the pandas-cat logger is set.
+
+    :raises ValueError: If ``verbose`` is not a known level.
+    """
+    if verbose is True:
+        level = logging.INFO
+    elif verbose is False or verbose is None:
+        level = logging.WARNING
+    elif isinstance(verbose, str):
+        level = logging.getLevelName(verbose.upper())
+    else:
+        level = verbose
+    if not isinstance(level, int):
+        raise ValueError(f"Unsupported verbose {verbose!r}, use True, False or a logging level like 'debug'.")
+    previous_level = logger.level
+    handler = None
+    if not logger.handlers and not logging.getLogger().handlers and level < logging.WARNING:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    try:
+        yield
+    finally:
+        logger.setLevel(previous_level)
+        if handler is not None:
+            logger.removeHandler(handler)
+
+
+class _ContingencyTables:
+    """
+    Shared pairwise contingency tables of a categorical dataset.
+
+    Every column is factorized to integer codes once.  Codes of all columns are
+    kept in one C-contiguous matrix (one row per column, ``-1`` for missing) of
+    the narrowest integer type, usually ``int8``, which is several times smaller
+    than object columns.  The table for a pair of columns is then built by a
+    single ``np.bincount`` over the combined codes and cached, so all
+    correlation metrics and heatmaps read the same counts instead of calling
+    ``pd.crosstab`` again and again.
+    """
+
+    def __init__(self, df: pandas.DataFrame):
+        codes = {}
+        categories = {}
+        for column in df.columns:
+            column_codes, categories[column] = self._factorize(df[column])
+            # narrow right away, so only one column is held in full intp codes at a time
+            codes[column] = column_codes.astype(self._code_dtype(len(categories[column])), copy=False)
+            del column_codes
+        self._set_codes(codes, categories, len(df))
+
+    @classmethod
+    def from_codes(cls, codes: dict, categories: dict, n_rows: int):
+        """
+        Return tables of columns already factorized, e.g. by :meth:`ProfileState.from_frame`.
+
+        :param codes: column -> integer codes (``-1`` for missing), the dictionary is emptied
+        :param categories: column -> categories (``pd.Index``) of the codes
+        :param n_rows: number of records
+        """
+        tables = cls.__new__(cls)
+        tables._set_codes(codes, categories, n_rows)
+        return tables
+
+    def _set_codes(self, codes: dict, categories: dict, n_rows: int):
+        self.columns = list(codes)
+        self.categories = {column: categories[column] for column in self.columns}
+        self._tables = {}
+        self._burt = None
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+        largest = max((len(categories) for categories in self.categories.values()), default=0)
+        self.codes = np.empty((len(self.columns), n_rows), dtype=self._code_dtype(largest))
+        for i, column in enumerate(self.columns):
+            self.codes[i] = codes.pop(column)
+
+    @classmethod
+    def from_state(cls, state, columns=None):
+        """
+        Return tables of a :class:`ProfileState`, which holds the tables of all pairs of columns.
+
+        :param state: profile state
+        :param columns: columns to use, defaults to all columns of the state with pairwise tables;
+            only the pairs selected by the ``target`` and ``pairs`` options of the state have tables
+        """
+        tables = cls.__new__(cls)
+        tables.columns = [column for column in state.columns if column not in state.excluded] \
+            if columns is None else list(columns)
+        tables.codes = None
+        tables.categories = {column: pd.Index(state.categories[column]) for column in tables.columns}
+        tables._tables = {}
+        tables._burt = None
+        for i, column_one in enumerate(tables.columns):
+            tables._tables[(column_one, column_one)] = np.diag(
+                np.append(state.counts[column_one], state.missing[column_one]))
+            for column_two in tables.columns[i + 1:]:
+                if (column_one, column_two) in state.tables or (column_two, column_one) in state.tables:
+                    tables._tables[(column_one, column_two)] = state.table(column_one, column_two)
+        return tables
+
+    @staticmethod
+    def _code_dtype(n_categories):
+        """Return the narrowest signed integer type for codes of ``n_categories`` categories."""
+        return next(dtype for dtype in (np.int8, np.int16, np.int32, np.int64)
+                    if n_categories <= np.iinfo(dtype).max)
+
+    @staticmethod
+    def _factorize(series):
+        """Return integer codes (``-1`` for missing) and categories of a column, in category order."""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.cat.codes.to_numpy(), series.cat.categories
+        try:
+            codes, categories = pd.factorize(series, sort=True)
+        except TypeError:
+            # mixed types which cannot be sorted, keep order of appearance
+            codes, categories = pd.factorize(series)
+        return codes, categories
+
+    def column_codes(self, column):
+        """Return codes of a column (``-1`` for missing), a contiguous row of the codes matrix."""
+        return self.codes[self._positions[column]]
+
+    def table(self, column_one, column_two, dropna: bool = True):
+        """
+        Return counts of all category combinations of two columns.
+
+        Rows follow categories of ``column_one``, columns follow categories
+        of ``column_two``.  Records with a missing value in either column are
+        not counted, same as in ``pd.crosstab``.  With ``dropna=False`` the
+        missing values are counted in an extra last row and column instead.
+        """
+        key = (column_one, column_two)
+        if key not in self._tables:
+            if (column_two, column_one) in self._tables:
+                counts = self._tables[(column_two, column_one)].T
+            elif self.codes is None:
+                raise ValueError(f"No contingency table of columns {column_one} and {column_two}, the profile state "
+                                 f"has tables only of the pairs selected by its target and pairs options.")
+            else:
+                # missing code -1 becomes the extra last category
+                n_x = len(self.categories[column_one]) + 1
+                n_y = len(self.categories[column_two]) + 1
+                x = self.column_codes(column_one).astype(np.intp)
+                y = self.column_codes(column_two).astype(np.intp)
+                x[x < 0] = n_x - 1
+                y[y < 0] = n_y - 1
+                counts = np.bincount(x * n_y + y, minlength=n_x * n_y).reshape(n_x, n_y)
+                self._tables[key] = counts
+        else:
+            counts = self._tables[key]
+        return counts[:-1, :-1] if dropna else counts
+
+    def burt(self, chunk_rows: int = 1000000):
+        """
+        Return the Burt matrix of all columns and the offset of each column in it.
+
+        All columns are one-hot encoded into one sparse indicator matrix ``X``
+        and the Burt matrix ``X.T @ X`` is accumulated over row chunks.  The
+        block at rows of column ``a`` and columns of column ``b`` is the full
+        contingency table of the pair, see :meth:`table`.
+        """
+        if self._burt is not None:
+            return self._burt
+        sizes = [len(self.categories[column]) for column in self.columns]
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        m = int(offsets[-1])
+        if self.codes is None:
+            # tables come from a profile state, just put them together
+            burt = np.zeros((m, m), dtype=np.int64)
+            for i, column_one in enumerate(self.columns):
+                for j in range(i, len(self.columns)):
+                    # the matrix is symmetric, the block of the other order of the pair is the transpose
+                    block = self.table(column_one, self.columns[j])
+                    burt[offsets[i]:offsets[i + 1], offsets[j]:offsets[j + 1]] = block
+                    burt[offsets[j]:offsets[j + 1], offsets[i]:offsets[i + 1]] = block.T
+            self._burt = (burt, offsets)
+            return self._burt
+        import scipy.sparse as sp
+
+        n = self.codes.shape[1]
+        burt = np.zeros((m, m), dtype=np.int64)
+        for start in range(0, n, chunk_rows):
+            rows = []
+            cols = []
+            for offset, codes in zip(offsets, self.codes[:, start:start + chunk_rows]):
+                present = np.flatnonzero(codes >= 0)
+                rows.append(present)
+                cols.append(codes[present] + offset)
+            rows = np.concatenate(rows)
+            indicator = sp.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, np.concatenate(cols))),
+                                      shape=(min(chunk_rows, n - start), m))
+            burt += (indicator.T @ indicator).toarray()
+        self._burt = (burt, offsets)
+        return self._burt
+
+    def crosstab(self, column_one, column_two):
+        """Return the table as a labelled DataFrame without empty rows and columns, like ``pd.crosstab``."""
+        counts = self.table(column_one, column_two)
+        rows = counts.sum(axis=1) > 0
+        cols = counts.sum(axis=0) > 0
+        return pd.DataFrame(counts[rows][:, cols],
+                            index=pd.Index(self.categories[column_one][rows], name=column_one),
+                            columns=pd.Index(self.categories[column_two][cols], name=column_two))
+
+
+class _ChartCache:
+    """
+    On-disk cache of rendered charts.
+
+    Each chart is stored in its own file named by a hash of its count table
+    and plotting parameters, so unchanged charts are read back instead of
+    being redrawn.  When the directory grows over ``max_bytes`` the least
+    recently used files are removed.  Charts of different backends (see the
+    ``chart_backend`` option of :meth:`pandas_cat.profile`) are kept apart.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 100 * 2**20, backend='svg'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.backend_name = self.name_of(backend)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def name_of(backend):
+        """
+        Return name telling the backend apart from others across runs, ``None`` if it cannot be named.
+
+        Functions are named by their module and qualified name, and a hash of
+        their code, so a changed function does not read charts drawn before.
+        Lambdas, nested functions and other callables cannot be told apart
+        by name, their charts are not cached.
+        """
+        if backend == 'matplotlib':
+            import matplotlib
+
+            return f"matplotlib {matplotlib.__version__}"
+        if not callable(backend):
+            return backend
+        qualname = getattr(backend, '__qualname__', None)
+        code = getattr(backend, '__code__', None)
+        if qualname is None or code is None or '<' in qualname:
+            return None
+        digest = hashlib.sha256(code.co_code + repr(code.co_consts).encode()).hexdigest()[:16]
+        return f"{backend.__module__}.{qualname} {digest}"
+
+    def key(self, chart):
+        """Return hash of the chart description and of the backend rendering it."""
+        h = hashlib.sha256()
+        h.update(f"{pandas_cat.version_string}|{self.backend_name}".encode())
+        for name in sorted(chart):
+            value = chart[name]
+            h.update(f"|{name}=".encode())
+            if isinstance(value, pd.DataFrame):
+                h.update(repr((list(map(str, value.index)), list(map(str, value.columns)),
+                               value.index.name, value.columns.name, str(value.values.dtype))).encode())
+                h.update(np.ascontiguousarray(value.values).tobytes())
+            elif isinstance(value, np.ndarray):
+                h.update(str(value.dtype).encode())
+                h.update(np.ascontiguousarray(value).tobytes())
+            else:
+                h.update(repr(value).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.svg.b64')
+
+    def get(self, chart):
+        """Return cached SVG of the chart or ``None``, counting hits and misses."""
+        path = self._path(self.key(chart))
+        try:
+            with open(path) as f:
+                content = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        # mark as recently used
+        os.utime(path)
+        self.hits += 1
+        return content
+
+    def put(self, chart, content):
+        """Store SVG of the chart."""
+        path = self._path(self.key(chart))
+        # unique for each thread, profile_async() jobs may share the directory
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def evict(self):
+        """Remove least recently used charts until the cache fits into ``max_bytes``."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.svg.b64'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+class ProfileState:
+    """
+    Counts of a categorical dataset from which profile reports are generated.
+
+    Holds per-column category counts, missing counts, detected missing-value
+    tokens, memory usage and contingency tables of all pairs of columns, but
+    not the records themselves.  New batches of records are added by
+    :meth:`pandas_cat.update`, so reports and association metrics of
+    append-only data can be regenerated in time proportional to the new batch.
+
+    Create it by :meth:`pandas_cat.profile_state`, pass it to
+    :meth:`pandas_cat.profile` or :meth:`pandas_cat.association_matrix`
+    instead of a DataFrame, and persist it by :meth:`save` and :meth:`load`.
+
+    A state collected with the ``sample`` option holds counts of the sampled
+    records only (see :attr:`population`) and cannot be merged.
+
+    With the ``high_cardinality`` option set to ``'other'``, columns over
+    ``cat_limit`` keep only their most frequent categories and the rest of
+    the records is counted in the :attr:`other_category` bucket, so the state
+    of such a column stays small however many chunks or shards are merged.
+    Exact counting of such a column stops once it has many more distinct
+    values than ``cat_limit``, its most frequent ones are then found by a
+    summary of bounded size.
+
+    With the default ``high_cardinality='drop'``, columns over ``cat_limit``
+    (see :attr:`excluded`) keep only a lower bound of their number of distinct
+    values, their categories are neither counted further nor merged.
+
+    With the ``target`` or ``pairs`` options only the contingency tables of
+    the selected pairs of columns are collected, so the state grows with the
+    number of columns instead of its square.
+    """
+
+    #: options which affect the counts, other profile options are used only when rendering
+    option_names = ('na_values', 'na_ignore', 'keep_default_na', 'na_case_insensitive', 'na_patterns', 'cat_limit',
+                    'sample', 'sample_seed', 'high_cardinality', 'target', 'pairs')
+
+    #: category of records of high-cardinality columns outside of their most frequent categories
+    other_category = '(Other)'
+
+    #: records of a column factorized at once
+    block_rows = 2**20
+
+    #: counters of the summary of a high-cardinality column per category of ``cat_limit``
+    summary_size = 10
+
+    def __init__(self, options: dict = None):
+        defaults = {'na_values': None, 'na_ignore': None, 'keep_default_na': True,
+                    'na_case_insensitive': False, 'na_patterns': None, 'cat_limit': 20,
+                    'sample': None, 'sample_seed': 0, 'high_cardinality': 'drop', 'target': None, 'pairs': None}
+        self.options = {name: (options or {}).get(name, defaults[name]) for name in self.option_names}
+        self.columns = []
+        # per column: list of categories and their counts (np.int64 array) in the same order
+        self.categories = {}
+        self.counts = {}
+        self.ordered = {}
+        self.missing = {}
+        # per column: detected missing-value token -> number of replaced values
+        self.detected = {}
+        # per column: deep memory usage in bytes (without index)
+        self.memory = {}
+        self.index_memory = 0
+        self.n_rows = 0
+        # (column_one, column_two) -> counts with missing values in the extra last row and column,
+        # column_one goes before column_two in columns; only pairs selected by target and pairs options
+        self.tables = {}
+        # columns over cat_limit, these have no categories, counts and pairwise tables
+        self.excluded = []
+        # excluded columns -> lower bound of their number of distinct values
+        self.distinct = {}
+        # number of records of the whole dataset if the counts are of a sample only, otherwise None
+        self.population = None
+        # per column: string representations of categories of the dataset which are not in the sample
+        self.unsampled = {}
+        # columns reduced to their most frequent categories and other_category -> upper bound of
+        # the number of records of any category in other_category (and of records a listed category misses)
+        self.bucketed = {}
+
+    @classmethod
+    def from_frame(cls, df: pandas.DataFrame, options: dict = None):
+        """
+        Collect the counts of a DataFrame.
+
+        Missing values are detected as by :meth:`pandas_cat.handle_missing_values`,
+        but the DataFrame is not changed.  Data preparation is not done here,
+        see :meth:`pandas_cat.profile_state`.
+        """
+        state = cls(options)
+        is_missing = state._missing_rule()
+        state.columns = list(df.columns)
+        state.n_rows = len(df)
+        state.index_memory = int(df.index.memory_usage(deep=True))
+        codes = {}
+        categories = {}
+        for column in state.columns:
+            codes[column], categories[column] = state._collect_column(column, df[column], is_missing)
+        state.excluded = [column for column in state.columns if column in state.distinct]
+        paired = [column for column in state.columns if column not in state.excluded]
+        tables = _ContingencyTables.from_codes({column: codes.pop(column) for column in paired}, categories, len(df))
+        del codes
+        selected = ProfileState._selected_pairs(state.options, state.columns, paired)
+        if selected is None:
+            selected = [(column_one, column_two) for i, column_one in enumerate(paired) for column_two in paired[i + 1:]]
+        for column_one, column_two in selected:
+            state.tables[(column_one, column_two)] = tables.table(column_one, column_two, dropna=False)
+        return state
+
+    def _collect_column(self, column, series, is_missing):
+        """
+        Collect the counts of a column and return its codes (``-1`` for missing) and categories.
+
+        Returns ``None`` codes and categories of a column excluded for being over ``cat_limit``.
+
+        The column is factorized once (see :meth:`_count_blocks`).  Missing
+        value tokens are looked up among its distinct values only and their
+        codes become ``-1`` by remapping the codes.  Categories of other than
+        categorical columns are sorted, or kept in order of appearance if they
+        cannot be sorted.  With the ``high_cardinality`` option set to
+        ``'other'``, a column over ``cat_limit`` is reduced to its most frequent
+        categories; if its exact counting stopped, the column is read once more
+        to code the records by the kept categories.
+        """
+        categorical = isinstance(series.dtype, pd.CategoricalDtype)
+        if categorical:
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            missing = np.fromiter((is_missing(value) for value in uniques), dtype=bool, count=len(uniques))
+            na_count = int(np.count_nonzero(codes < 0))
+            parts, error = [codes], 0
+        else:
+            uniques, counts, missing, na_count, parts, error = self._count_blocks(column, series, is_missing)
+
+        # same order as value_counts, unused categories included
+        detected = np.flatnonzero(missing)
+        detected = detected[np.argsort(-counts[detected], kind='stable')]
+        self.detected[column] = {'pandas.NAN': na_count} if na_count else {}
+        self.detected[column].update((str(uniques[i]), int(counts[i])) for i in detected)
+        self.missing[column] = na_count + int(counts[detected].sum())
+        self.memory[column] = ProfileState._memory_usage(series, uniques[missing])
+
+        kept = np.flatnonzero(~missing)
+        categories = uniques[kept]
+        counts = counts[kept]
+        limit = self.options['cat_limit']
+        if self.options['high_cardinality'] != 'other' and (parts is None or np.count_nonzero(counts) > limit):
+            self.ordered[column] = categorical and bool(series.cat.ordered)
+            self._exclude(column, np.count_nonzero(counts))
+            return None, None
+        if self.options['high_cardinality'] == 'other' and np.count_nonzero(counts) > limit:
+            # counts of the summary may be short by the error, so may be the bound
+            categories, positions, bound = ProfileState._top_categories(list(categories), counts, limit)
+            self.bucketed[column] = bound + error
+            categories = pd.Index(categories)
+        elif categorical:
+            positions = np.arange(len(categories))
+        else:
+            try:
+                positions, categories = pd.factorize(categories, sort=True)
+            except TypeError:
+                # mixed types which cannot be sorted, keep order of appearance
+                positions = np.arange(len(categories))
+        self.categories[column] = categories.tolist()
+        self.ordered[column] = categorical and bool(series.cat.ordered) and column not in self.bucketed
+        dtype = _ContingencyTables._code_dtype(len(categories))
+
+        if parts is None:
+            # the codes were not kept, values outside of the kept categories go to other_category
+            tokens = uniques[missing]
+            parts = []
+            for start in range(0, len(series), ProfileState.block_rows):
+                block = series.iloc[start:start + ProfileState.block_rows]
+                codes = categories.get_indexer(block)
+                codes[codes < 0] = len(categories) - 1
+                codes[(block.isna() | block.isin(tokens)).to_numpy()] = -1
+                parts.append(codes.astype(dtype))
+            codes = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+            self.counts[column] = np.bincount(codes[codes >= 0], minlength=len(categories))
+            return codes, categories
+
+        self.counts[column] = np.zeros(len(categories), dtype=np.int64)
+        np.add.at(self.counts[column], positions, counts)
+        # the extra last slot is where code -1 of values missing already goes
+        mapping = np.full(len(uniques) + 1, -1, dtype=dtype)
+        mapping[kept] = positions
+        return (np.concatenate([mapping[codes] for codes in parts]) if parts else np.zeros(0, dtype=dtype)), categories
+
+    def _count_blocks(self, column, series, is_missing):
+        """
+        Count distinct values of a column, factorizing :attr:`block_rows` records at a time.
+
+        Counting is exact until a column has more than ``cat_limit`` distinct
+        values, or more than :attr:`summary_size` times ``cat_limit`` with the
+        ``high_cardinality`` option set to ``'other'``, and more blocks follow.
+        Then it stops and the codes are dropped.  Only the most frequent values
+        are counted further by a Misra-Gries summary with ``'other'``, only the
+        lower bound of the number of distinct values (see :attr:`distinct`) is
+        kept otherwise, so the memory stays bounded however many distinct
+        values the column has.  Missing value tokens are always counted exactly.
+
+        :returns: distinct values (or those of the summary), their counts, whether each is a missing value token,
+            number of values missing already, codes of each block into the distinct values (``None`` once
+            counting stopped) and the error, the most by which any count of the summary falls short
+        """
+        bucket = self.options['high_cardinality'] == 'other'
+        capacity = ProfileState.summary_size * self.options['cat_limit'] if bucket else self.options['cat_limit']
+        uniques = None
+        counts = np.zeros(0, dtype=np.int64)
+        missing = np.zeros(0, dtype=bool)
+        na_count = 0
+        parts = []
+        error = 0
+        for start in range(0, len(series), ProfileState.block_rows):
+            codes, block_uniques = pd.factorize(series.iloc[start:start + ProfileState.block_rows])
+            na_count += int(np.count_nonzero(codes < 0))
+            if uniques is None:
+                uniques = block_uniques[:0]
+            positions = uniques.get_indexer(block_uniques)
+            new = positions < 0
+            positions[new] = len(uniques) + np.arange(np.count_nonzero(new))
+            uniques = uniques.append(block_uniques[new])
+            missing = np.append(missing, np.fromiter((is_missing(value) for value in block_uniques[new]),
+                                                     dtype=bool, count=np.count_nonzero(new)))
+            counts = np.append(counts, np.zeros(np.count_nonzero(new), dtype=np.int64))
+            counts[positions] += np.bincount(codes[codes >= 0], minlength=len(block_uniques))
+            if parts is not None:
+                parts.append(np.append(positions, -1).astype(_ContingencyTables._code_dtype(len(uniques)))[codes])
+            if np.count_nonzero(~missing) > capacity and start + ProfileState.block_rows < len(series):
+                parts = None
+                if not bucket:
+                    # over the limit for sure, keep the tokens only
+                    self.distinct[column] = max(self.distinct.get(column, 0), int(np.count_nonzero(~missing)))
+                    uniques = uniques[missing]
+                    counts = counts[missing]
+                    missing = missing[missing]
+                    continue
+                # over the limit for sure and more records follow,
+                # keep the capacity largest counters less the next largest count
+                values = counts[~missing]
+                cut = np.partition(values, len(values) - capacity - 1)[len(values) - capacity - 1]
+                keep = missing | (counts > cut)
+                counts = np.where(missing, counts, counts - cut)[keep]
+                uniques = uniques[keep]
+                missing = missing[keep]
+                error += int(cut)
+        if uniques is None:
+            uniques = series.iloc[:0].unique()
+        return pd.Index(uniques), counts, missing, na_count, parts, error
+
+    def _exclude(self, column, distinct):
+        """Drop categories and counts of a column over ``cat_limit``, keep a lower bound of its distinct values."""
+        self.distinct[column] = max(self.distinct.get(column, 0), int(distinct))
+        self.categories[column] = []
+        self.counts[column] = np.zeros(0, dtype=np.int64)
+        if column in self.unsampled:
+            self.unsampled[column] = []
+
+    def _missing_rule(self):
+        """Return function telling whether a value is a missing value token by the options of the state."""
+        return pandas_cat._missing_value_rule(
+            pandas_cat._missing_values(self.options['na_values'], self.options['na_ignore'],
+                                       self.options['keep_default_na']),
+            self.options['na_case_insensitive'], self.options['na_patterns'])
+
+    @staticmethod
+    def _selected_pairs(options: dict, columns, paired):
+        """
+        Return pairs of columns selected by the ``target`` and ``pairs`` options, ``None`` if neither is set.
+
+        The target is paired with every other column.  Each pair is listed
+        once, with its columns in the order of ``paired``; pairs with a column
+        not in ``paired`` (e.g. over ``cat_limit``) and of a column with itself
+        are left out.
+
+        :param options: options with ``target`` and ``pairs``
+        :param columns: all columns of the dataset
+        :param paired: columns which have contingency tables
+
+        :raises ValueError: If the target or a column of a pair is not in ``columns``.
+        """
+        target = options.get('target')
+        pairs = options.get('pairs')
+        if target is None and pairs is None:
+            return None
+        pairs = [tuple(pair) for pair in pairs or []]
+        unknown = [column for column in ([] if target is None else [target]) + [c for pair in pairs for c in pair]
+                   if column not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown} in target or pairs, use some of {list(columns)}.")
+        if target is not None:
+            pairs += [(target, column) for column in paired]
+        positions = {column: i for i, column in enumerate(paired)}
+        selected = {tuple(sorted((column_one, column_two), key=positions.get)) for column_one, column_two in pairs
+                    if column_one != column_two and column_one in positions and column_two in positions}
+        return sorted(selected, key=lambda pair: (positions[pair[0]], positions[pair[1]]))
+
+    def table(self, column_one, column_two):
+        """Return counts of a pair of columns with missing values in the extra last row and column."""
+        if (column_one, column_two) in self.tables:
+            return self.tables[(column_one, column_two)]
+        return self.tables[(column_two, column_one)].T
+
+    def merge(self, other):
+        """
+        Return a new state with counts of both states.
+
+        Categories are matched by their string representation, so categories
+        of a prepared dataset match raw values of a new batch.  Categories of
+        ordered columns keep their order and categories not seen before are
+        appended, new categories of other columns are sorted.  Columns over
+        ``cat_limit`` in either state are not matched, they stay excluded.  The
+        merge is associative, states of any parts of a dataset can be merged in any grouping.
+
+        :raises ValueError: If the states have different columns or pairs of columns, or any of them is of a sample.
+        """
+        if self.population is not None or other.population is not None:
+            raise ValueError("Cannot merge profile states collected from a sample of records.")
+        if not self.columns:
+            return copy.deepcopy(other)
+        if not other.columns:
+            return copy.deepcopy(self)
+        if list(self.columns) != list(other.columns):
+            raise ValueError(f"Cannot merge profile states with different columns {self.columns} and {other.columns}.")
+        selections = [(state.options['target'], None if state.options['pairs'] is None else
+                       {frozenset(pair) for pair in state.options['pairs']}) for state in (self, other)]
+        if selections[0] != selections[1]:
+            raise ValueError("Cannot merge profile states with tables of different pairs of columns "
+                             "(target and pairs options).")
+
+        result = ProfileState(self.options)
+        result.columns = list(self.columns)
+        result.n_rows = self.n_rows + other.n_rows
+        result.index_memory = self.index_memory + other.index_memory
+        own_maps = {}
+        other_maps = {}
+        for column in self.columns:
+            result.missing[column] = self.missing[column] + other.missing[column]
+            detected = dict(self.detected[column])
+            for token, count in other.detected[column].items():
+                detected[token] = detected.get(token, 0) + count
+            result.detected[column] = detected
+            result.memory[column] = self.memory[column] + other.memory[column]
+            ordered = self.ordered[column] or other.ordered[column]
+            if column in self.excluded or column in other.excluded:
+                # over the limit anyway, the categories of the other state are not matched at all
+                result.ordered[column] = ordered
+                result._exclude(column, max(state.distinct.get(column, np.count_nonzero(state.counts[column]))
+                                            for state in (self, other)))
+                continue
+            first, second = (other, self) if other.ordered[column] and not self.ordered[column] else (self, other)
+            categories = {}
+            for category in first.categories[column] + second.categories[column]:
+                categories.setdefault(str(category), category)
+            categories = list(categories.values())
+            if not ordered and len(categories) != len(self.categories[column]):
+                categories = ProfileState._sorted(categories)
+            positions = {str(category): i for i, category in enumerate(categories)}
+            # the missing values slot stays the last one
+            own_maps[column] = np.array([positions[str(category)] for category in self.categories[column]]
+                                        + [len(categories)], dtype=np.intp)
+            other_maps[column] = np.array([positions[str(category)] for category in other.categories[column]]
+                                          + [len(categories)], dtype=np.intp)
+
+            counts = np.zeros(len(categories), dtype=np.int64)
+            np.add.at(counts, own_maps[column][:-1], self.counts[column])
+            np.add.at(counts, other_maps[column][:-1], other.counts[column])
+            if result.options['high_cardinality'] == 'other' and (
+                    column in self.bucketed or column in other.bucketed
+                    or np.count_nonzero(counts) > result.options['cat_limit']):
+                # categories may have been counted in other_category of either state, their errors add up
+                categories, buckets, bound = ProfileState._top_categories(
+                    categories, counts, result.options['cat_limit'])
+                result.bucketed[column] = self.bucketed.get(column, 0) + other.bucketed.get(column, 0) + bound
+                buckets = np.append(buckets, len(categories))
+                own_maps[column] = buckets[own_maps[column]]
+                other_maps[column] = buckets[other_maps[column]]
+                counts = np.bincount(buckets[:-1], weights=counts, minlength=len(categories)).astype(np.int64)
+                ordered = False
+            result.ordered[column] = ordered
+            if result.options['high_cardinality'] != 'other' and np.count_nonzero(counts) > result.options['cat_limit']:
+                result._exclude(column, np.count_nonzero(counts))
+                continue
+            result.categories[column] = categories
+            result.counts[column] = counts
+
+        result.excluded = [column for column in result.columns if column in result.distinct]
+        for (column_one, column_two), table in self.tables.items():
+            if column_one in result.excluded or column_two in result.excluded:
+                continue
+            merged = np.zeros((len(result.categories[column_one]) + 1, len(result.categories[column_two]) + 1),
+                              dtype=np.int64)
+            np.add.at(merged, np.ix_(own_maps[column_one], own_maps[column_two]), table)
+            np.add.at(merged, np.ix_(other_maps[column_one], other_maps[column_two]),
+                      other.table(column_one, column_two))
+            result.tables[(column_one, column_two)] = merged
+        return result
+
+    @classmethod
+    def merge_all(cls, states):
+        """
+        Return a state with counts of all states, e.g. of shards profiled in parallel or on different machines.
+
+        The states are merged pairwise in a balanced tree, so categories and
+        tables are remapped about log2(len(states)) times instead of once per state.
+        """
+        states = list(states)
+        if not states:
+            return cls()
+        while len(states) > 1:
+            merged = [left.merge(right) for left, right in zip(states[::2], states[1::2])]
+            if len(states) % 2:
+                merged.append(states[-1])
+            states = merged
+        return states[0]
+
+    def recode(self, column, categories: list, positions, ordered: bool):
+        """
+        Replace categories of a column in place.
+
+        :param column: Column to recode.
+        :param categories: New categories.
+        :param positions: Position in the new categories for each current category,
+            several current categories may be merged into one.
+        :param ordered: Whether the new categories are ordered.
+        """
+        # the missing values slot stays the last one
+        mapping = np.append(np.asarray(positions, dtype=np.intp), len(categories))
+        counts = np.zeros(len(categories), dtype=np.int64)
+        np.add.at(counts, mapping[:-1], self.counts[column])
+        self.categories[column] = list(categories)
+        self.counts[column] = counts
+        self.ordered[column] = ordered
+        for (column_one, column_two), table in self.tables.items():
+            if column not in (column_one, column_two):
+                continue
+            shape = list(table.shape)
+            shape[column_one != column] = len(categories) + 1
+            recoded = np.zeros(shape, dtype=np.int64)
+            if column_one == column:
+                np.add.at(recoded, mapping, table)
+            else:
+                np.add.at(recoded, (slice(None), mapping), table)
+            self.tables[(column_one, column_two)] = recoded
+
+    @staticmethod
+    def _top_categories(categories: list, counts, limit: int):
+        """
+        Keep ``limit - 1`` most frequent categories and put all others into :attr:`other_category`.
+
+        :returns: new categories (by decreasing count, :attr:`other_category` last),
+            position of each of the given categories in them and the smallest count of a
+            kept category, which no category put into :attr:`other_category` exceeds
+        """
+        candidates = np.asarray(counts).copy()
+        # an other_category bucket from before stays the bucket
+        candidates[[i for i, category in enumerate(categories) if str(category) == ProfileState.other_category]] = -1
+        top = np.argsort(-candidates, kind='stable')[:limit - 1]
+        top = top[candidates[top] > 0]
+        positions = np.full(len(categories), len(top), dtype=np.intp)
+        positions[top] = np.arange(len(top))
+        return ([categories[i] for i in top] + [ProfileState.other_category], positions,
+                int(candidates[top].min()) if len(top) else 0)
+
+    @staticmethod
+    def _memory_usage(series, tokens=()):
+        """
+        Deep memory usage of a column without index, the same as ``df.memory_usage(deep=True)`` reports.
+
+        The column is measured as :meth:`pandas_cat.handle_missing_values`
+        leaves it, with the missing value ``tokens`` replaced.
+        """
+        if len(tokens):
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.cat.remove_categories(tokens)
+            else:
+                if series.dtype.kind in 'iub':
+                    series = series.astype(object)
+                series = series.mask(series.isin(tokens), pd.NA)
+        return int(series.memory_usage(deep=True, index=False))
+
+    @staticmethod
+    def _tokens(series, is_missing):
+        """Return the missing value tokens among the values (categories of a categorical) of a column."""
+        values = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else pd.unique(series)
+        return [value for value in values if is_missing(value)]
+
+    @staticmethod
+    def _sorted(categories):
+        try:
+            return sorted(categories)
+        except TypeError:
+            return sorted(categories, key=str)
+
+    def to_dict(self):
+        """Return the state as a JSON serializable dictionary."""
+        def plain(value):
+            return value.item() if isinstance(value, np.generic) else value
+
+        return {
+            'version': pandas_cat.version_string,
+            'options': self.options,
+            'columns': self.columns,
+            'categories': [[plain(category) for category in self.categories[column]] for column in self.columns],
+            'counts': [self.counts[column].tolist() for column in self.columns],
+            'ordered': [self.ordered[column] for column in self.columns],
+            'missing': [self.missing[column] for column in self.columns],
+            'detected': [list(self.detected[column].items()) for column in self.columns],
+            'memory': [self.memory[column] for column in self.columns],
+            'index_memory': self.index_memory,
+            'n_rows': self.n_rows,
+            'tables': [[column_one, column_two, table.tolist()]
+                       for (column_one, column_two), table in self.tables.items()],
+            'excluded': self.excluded,
+            'population': self.population,
+            'unsampled': [self.unsampled.get(column, []) for column in self.columns],
+            'bucketed': [self.bucketed.get(column) for column in self.columns],
+            'distinct': [self.distinct.get(column) for column in self.columns],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Return the state from a dictionary created by :meth:`to_dict`."""
+        state = cls(data['options'])
+        state.columns = list(data['columns'])
+        for i, column in enumerate(state.columns):
+            state.categories[column] = list(data['categories'][i])
+            state.counts[column] = np.array(data['counts'][i], dtype=np.int64)
+            state.ordered[column] = data['ordered'][i]
+            state.missing[column] = data['missing'][i]
+            state.detected[column] = dict(data['detected'][i])
+            state.memory[column] = data['memory'][i]
+        state.index_memory = data['index_memory']
+        state.n_rows = data['n_rows']
+        state.tables = {(column_one, column_two): np.array(table, dtype=np.int64).reshape(
+            len(state.categories[column_one]) + 1, len(state.categories[column_two]) + 1)
+            for column_one, column_two, table in data['tables']}
+        state.excluded = list(data['excluded'])
+        state.bucketed = {column: bound for column, bound in zip(state.columns, data.get('bucketed', []))
+                          if bound is not None}
+        state.population = data.get('population')
+        if state.population is not None:
+            state.unsampled = {column: list(unsampled) for column, unsampled in zip(state.columns, data['unsampled'])}
+        distinct = dict(zip(state.columns, data.get('distinct', [])))
+        for column in state.excluded:
+            # states saved before kept all categories of excluded columns
+            state._exclude(column, distinct.get(column) or np.count_nonzero(state.counts[column]))
+        return state
+
+    def save(self, path: str):
+        """Save the state to a JSON file (gzip compressed if the path ends with ``.gz``)."""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str):
+        """Load the state saved by :meth:`save`."""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            return cls.from_dict(json.load(f))
+
+
+class ColumnProfile:
+    """
+    Counts of one column of a :class:`ProfileState` and statistics derived from them.
+
+    Computed once per column, all summary tables, frequency tables and charts
+    of the reports are built from it.  For a state of a sample, percentages
+    are estimates for the whole dataset and :attr:`intervals` holds their
+    95% confidence intervals.
+    """
+
+    def __init__(self, state: ProfileState, column):
+        self.name = column
+        self.categories = state.categories[column]
+        self.counts = state.counts[column]
+        self.ordered = state.ordered[column]
+        self.missing = state.missing[column]
+        self.detected = state.detected[column]
+        self.n_rows = state.n_rows
+        self.memory = state.memory[column]
+        self.index_memory = state.index_memory
+        self.population = state.population
+        # positions of categories present in the data, categories missed by the sample included
+        present = self.counts > 0
+        if state.unsampled.get(column):
+            present |= np.isin([str(category) for category in self.categories], state.unsampled[column])
+        self.observed = np.flatnonzero(present)
+        self.percentages = self.counts / max(self.n_rows, 1) * 100
+        self.missing_percentage = self.missing / max(self.n_rows, 1) * 100
+        # lower and upper bounds of percentages (one row per category) and of the missing percentage
+        self.intervals = None
+        self.missing_interval = None
+        if self.population is not None:
+            self.intervals = np.column_stack(pandas_cat._wilson_interval(self.counts, self.n_rows, self.population))
+            self.missing_interval = pandas_cat._wilson_interval(self.missing, self.n_rows, self.population)
+        # number of distinct values including the empty one, at least that many for a column over cat_limit
+        self.n_categories = state.distinct.get(column, len(self.observed)) + (1 if self.missing > 0 else 0)
+        # positions of extremes, unused categories of categorical columns count as well, same as in value_counts
+        self.most_frequent = int(np.argmax(self.counts)) if len(self.counts) else None
+        self.least_frequent = int(np.argmin(self.counts)) if len(self.counts) else None
+
+    def order(self):
+        """Positions of all categories, in category order for ordered columns, otherwise the most frequent first."""
+        if self.ordered:
+            return np.arange(len(self.categories))
+        return np.argsort(-self.counts, kind='stable')
+
+    def extreme(self, position):
+        """Return category, count and percentage of the category at the position (e.g. :attr:`most_frequent`)."""
+        return self.categories[position], int(self.counts[position]), float(self.percentages[position])
+
+
+class ProfileTrace:
+    """
+    Wall time and memory of the stages of one :meth:`pandas_cat.profile` run.
+
+    Returned by :meth:`pandas_cat.profile` (and passed to the callback) when
+    the ``trace`` option is set.  Each stage records its wall time, the growth
+    of the peak resident set size of the process (``None`` where the
+    ``resource`` module is not available) and, if ``tracemalloc`` is tracing,
+    the peak of memory allocated during the stage.  :meth:`to_dict` returns
+    the numbers ready to be exported to a metrics system.
+    """
+
+    def __init__(self, checkpoint=None):
+        # one dict per stage in the order the stages ran
+        self.stages = []
+        # (column_one, column_two) -> seconds spent on statistics and charts of the pair
+        self.pairs = {}
+        # number of charts rendered, read from the chart cache and embedded as data drawn in the browser
+        self.charts = {'rendered': 0, 'cached': 0, 'embedded': 0}
+        # report section -> size in bytes
+        self.sections = {}
+        # called with each finished stage and with None after each pair of columns, may raise
+        # to stop the run, see ProfileJob
+        self._checkpoint = checkpoint
+        self._lap = time.perf_counter()
+        self._rss = self._peak_rss()
+        self._traced = None
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._traced = tracemalloc.get_traced_memory()[0]
+
+    @staticmethod
+    def _peak_rss():
+        """Peak resident set size of the process in bytes, ``None`` if unknown."""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def lap(self, name):
+        """Record a stage which ends now and started when the previous one ended."""
+        now = time.perf_counter()
+        rss = self._peak_rss()
+        stage = {'stage': name, 'seconds': now - self._lap,
+                 'peak_rss_growth': None if rss is None or self._rss is None else rss - self._rss,
+                 'traced_peak': None}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # peak over the memory allocated when the stage started
+            stage['traced_peak'] = peak - (self._traced if self._traced is not None else current)
+            tracemalloc.reset_peak()
+            self._traced = current
+        self.stages.append(stage)
+        logger.debug(f"...stage {name} took {stage['seconds']:.3f} s")
+        self._lap = now
+        self._rss = rss
+        self.checkpoint(stage)
+
+    def add_pair(self, column_one, column_two, seconds):
+        """Add time spent on a pair of columns."""
+        key = (column_one, column_two)
+        self.pairs[key] = self.pairs.get(key, 0.0) + seconds
+        self.checkpoint()
+
+    def checkpoint(self, stage: dict = None):
+        """Pass a finished stage (or ``None`` between pairs of columns) to the checkpoint callback, if any."""
+        if self._checkpoint is not None:
+            self._checkpoint(stage)
+
+    def record_sections(self, html: str, markers):
+        """
+        Record sizes of sections of a report.
+
+        :param html: the report
+        :param markers: ``(section, marker)`` pairs, each section starts at its marker
+            searched after the start of the previous section, text before the first
+            one is the ``'head'`` section
+        """
+        bounds = [('head', 0)]
+        for name, marker in markers:
+            position = html.find(marker, bounds[-1][1])
+            if position >= 0:
+                bounds.append((name, position))
+        ends = [start for _, start in bounds[1:]] + [len(html)]
+        self.sections = {name: len(html[start:end].encode('utf-8')) for (name, start), end in zip(bounds, ends)}
+
+    @property
+    def seconds(self):
+        """Total wall time of all stages."""
+        return sum(stage['seconds'] for stage in self.stages)
+
+    def to_dict(self):
+        """Return the trace as a JSON serializable dictionary."""
+        return {
+            'seconds': self.seconds,
+            'stages': [dict(stage) for stage in self.stages],
+            'pairs': [{'columns': [column_one, column_two], 'seconds': seconds}
+                      for (column_one, column_two), seconds in self.pairs.items()],
+            'charts': dict(self.charts),
+            'sections': dict(self.sections),
+        }
+
+
+class _Cancelled(Exception):
+    """Raised at a checkpoint of a cancelled :class:`ProfileJob`."""
+
+
+class ProfileJob:
+    """
+    Profile report generated in a background thread, see :meth:`pandas_cat.profile_async`.
+
+    Awaiting the job returns the result of :meth:`pandas_cat.profile`.
+    ``async for`` over the job yields progress, a dict of each finished stage
+    (as in :attr:`ProfileTrace.stages`) with its ``step`` number and the
+    number of ``steps``, and ends when the job is done.  :meth:`cancel`, or
+    cancelling the task awaiting the job or its progress, stops the run at
+    its next checkpoint and awaiting the job then raises
+    ``asyncio.CancelledError``.
+    """
+
+    def __init__(self, run, stages: list, executor=None):
+        self.stages = stages
+        self._cancelled = threading.Event()
+        self._loop = asyncio.get_running_loop()
+        self._progress = asyncio.Queue()
+        self._steps = 0
+        self._future = self._loop.run_in_executor(executor, run, self._checkpoint)
+        self._future.add_done_callback(self._done)
+
+    def _checkpoint(self, stage):
+        """Called by the worker thread, see :meth:`ProfileTrace.checkpoint`."""
+        if self._cancelled.is_set():
+            raise _Cancelled()
+        if stage is not None:
+            self._steps += 1
+            progress = {**stage, 'step': self._steps, 'steps': len(self.stages)}
+            self._loop.call_soon_threadsafe(self._progress.put_nowait, progress)
+
+    def _done(self, future):
+        if self._cancelled.is_set() and not future.cancelled():
+            # the job was abandoned, its _Cancelled exception does not have to be awaited
+            future.exception()
+        # end of the progress stream
+        self._progress.put_nowait(None)
+
+    def cancel(self):
+        """Stop the run at its next checkpoint."""
+        self._cancelled.set()
+
+    def cancelled(self):
+        """Whether the job was cancelled."""
+        return self._cancelled.is_set()
+
+    def done(self):
+        """Whether the run has finished, stopped or failed."""
+        return self._future.done()
+
+    async def _result(self):
+        try:
+            # the worker keeps running when the awaiting task is cancelled, stop it as well
+            return await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        except _Cancelled:
+            raise asyncio.CancelledError() from None
+
+    def __await__(self):
+        return self._result().__await__()
+
+    async def __aiter__(self):
+        while True:
+            try:
+                progress = await self._progress.get()
+            except asyncio.CancelledError:
+                # nobody is waiting for the report any more
+                self.cancel()
+                raise
+            if progress is None:
+                return
+            yield progress
+
+
+class ProfileResult:
+    """
+    Everything the profile reports show, computed once by :meth:`pandas_cat.compute_profile`.
+
+    Holds the :class:`ProfileState` with the counts, a :class:`ColumnProfile`
+    of each column, contingency tables of all pairs of columns within the
+    ``cat_limit`` of the state and their association matrices (Cramer's V,
+    Theil's U and Spearman rank, square DataFrames indexed by column names)
+    and, for a sample, bootstrap intervals of the association metrics.
+    With the ``target`` or ``pairs`` options only the selected pairs (see
+    :attr:`pairs`) are computed and the other cells of the matrices are NaN.
+    Reports of any template are rendered from it by
+    :meth:`pandas_cat.render_html` and :meth:`to_dict` exports it, nothing is
+    computed again.
+    """
+
+    def __init__(self, state: ProfileState, options: dict, trace: ProfileTrace = None):
+        self.state = state
+        self.options = options
+        # called after each pair of columns, see ProfileTrace.checkpoint
+        checkpoint = trace.checkpoint if trace is not None else None
+        self.column_profiles = {column: ColumnProfile(state, column) for column in state.columns}
+        self.tables = _ContingencyTables.from_state(state)
+        # pairs of columns selected by the target and pairs options (of the profile, otherwise of the state),
+        # None for all pairs
+        self.pairs = ProfileState._selected_pairs(options, state.columns, self.tables.columns)
+        if self.pairs is None:
+            self.pairs = ProfileState._selected_pairs(state.options, state.columns, self.tables.columns)
+        self.cramers_v = pandas_cat._cramers_v_matrix(self.tables, pairs=self.pairs)
+        # cell at row x and column y is U(x|y)
+        self.theils_u = pandas_cat._theils_u_matrix(self.tables, dropna=not options['theils_u_na_category'],
+                                                    checkpoint=checkpoint, pairs=self.pairs)
+        self.spearman = pandas_cat._spearman_matrix(self.tables, checkpoint=checkpoint, pairs=self.pairs)
+        # (column_one, column_two) -> metric name -> (lower, upper), empty unless the state is of a sample
+        self.intervals = {}
+        if state.population is not None:
+            self.intervals = pandas_cat._association_intervals(
+                self.tables, seed=state.options['sample_seed'],
+                theils_u_dropna=not options['theils_u_na_category'], checkpoint=checkpoint, pairs=self.pairs)
+
+    @property
+    def sampled(self):
+        """Whether the profile is of a random sample of records."""
+        return self.state.population is not None
+
+    def to_dict(self):
+        """
+        Return the profile as a JSON serializable dictionary.
+
+        Columns are listed in the order of the dataset with their categories
+        in category order; association matrices have rows and columns in the
+        order of ``associations['columns']``, pairs which were not selected
+        by the ``target`` and ``pairs`` options are ``None``.
+        """
+        def plain(value):
+            return value.item() if isinstance(value, np.generic) else value
+
+        columns = []
+        for column, column_profile in self.column_profiles.items():
+            item = {
+                'name': plain(column),
+                'categories': [plain(category) for category in column_profile.categories],
+                'counts': column_profile.counts.tolist(),
+                'percentages': column_profile.percentages.tolist(),
+                'ordered': column_profile.ordered,
+                'missing': int(column_profile.missing),
+                'detected': {str(token): int(count) for token, count in column_profile.detected.items()},
+                'memory': int(column_profile.memory),
+                'excluded': column in self.state.excluded,
+                'bucketed': self.state.bucketed.get(column),
+            }
+            if self.sampled:
+                item['intervals'] = column_profile.intervals.tolist()
+                item['missing_interval'] = [float(bound) for bound in column_profile.missing_interval]
+            columns.append(item)
+        def matrix(values):
+            return [[None if np.isnan(value) else value for value in row] for row in values.to_numpy().tolist()]
+
+        associations = {'columns': [plain(column) for column in self.tables.columns],
+                        'cramers_v': matrix(self.cramers_v),
+                        'theils_u': matrix(self.theils_u),
+                        'spearman': matrix(self.spearman)}
+        if self.pairs is not None:
+            associations['pairs'] = [[plain(column_one), plain(column_two)] for column_one, column_two in self.pairs]
+        if self.sampled:
+            associations['intervals'] = [
+                {'columns': [plain(column_one), plain(column_two)], **{metric: list(bounds) for metric, bounds in metrics.items()}}
+                for (column_one, column_two), metrics in self.intervals.items()]
+        return {
+            'version': pandas_cat.version_string,
+            'n_rows': self.state.n_rows,
+            'population': self.state.population,
+            'index_memory': self.state.index_memory,
+            'columns': columns,
+            'associations': associations,
+        }
+
 
 class pandas_cat:
     """
@@ -37,9 +1280,12 @@ class pandas_cat:
         Profile a categorical dataset and write an HTML report.
 
         The report is written to ``<cwd>/report/<out_html>``.  The directory is
-        created automatically if it does not exist.
+        created automatically if it does not exist.  Same as
+        :meth:`compute_profile` followed by :meth:`render_html`, which render
+        several reports from one computation.
 
-        :param df: DataFrame to profile.
+        :param df: DataFrame to profile, or :class:`ProfileState` returned by
+            :meth:`profile_state` or :meth:`update`.
         :param dataset_name: Title shown in the report header.
         :param template: Report template to use.  Accepted values:
 
@@ -56,265 +1302,491 @@ class pandas_cat:
               order all ordinal variables.
             * **cat_limit** (*int*, default ``20``) — maximum categories
               for variable to be included in the report.
+            * **high_cardinality** (*str*, default ``'drop'``) — what to do with
+              variables over ``cat_limit``; ``'drop'`` removes them from the
+              report, ``'other'`` keeps their ``cat_limit - 1`` most frequent
+              categories and counts the rest as ``'(Other)'``, also in
+              correlations.
+            * **target** (*str*, default ``None``) — compute association
+              metrics and crosstabs only of pairs of this column with each
+              other column (e.g. an outcome like ``'Severity'``), so their
+              cost grows with the number of columns instead of its square.
+              Other cells of the correlation matrices are left empty.
+            * **pairs** (*list*, default ``None``) — pairs of columns, like
+              ``[('Sex', 'Severity')]``, to compute association metrics and
+              crosstabs of, together with the pairs of ``target`` if set.
             * **na_values** (*list*) — additional strings to treat as missing
               on top of the built-in list.
             * **na_ignore** (*list*) — strings from the built-in missing-value
               list that should *not* be treated as a missing value.
             * **keep_default_na** (*bool*, default ``True``) — whether to use
               the built-in list on the top of na_values (default is True).
-
-        :returns: ``None``.  The report is written to disk.
+            * **na_case_insensitive** (*bool*, default ``False``) — strings
+              matching a missing value in any letter case (e.g. ``'N/a'``) are
+              also treated as missing.
+            * **na_patterns** (*list*) — regular expressions, strings fully
+              matching any of them are also treated as missing.
+            * **theils_u_na_category** (*bool*, default ``False``) — interactive
+              template only; count missing values as a separate category in
+              Theil's U instead of skipping them like the crosstab-based metrics.
+            * **n_jobs** (*int*, default ``1``) — number of worker processes
+              counting categories and contingency tables of row shards and
+              (default template only) rendering charts, ``-1`` uses all CPUs.
+              The report is the same as when computed serially.
+            * **render** (*str*, default ``'server'``) — default template only;
+              ``'client'`` embeds just the counts as JSON and draws histograms
+              and heatmaps in the browser, which keeps the report small and
+              skips matplotlib completely.
+            * **chart_backend** (*str* or *callable*, default ``'svg'``) —
+              default template only; ``'svg'`` writes the bar charts and
+              heatmaps as SVG directly from the counts, ``'matplotlib'`` draws
+              them by matplotlib and seaborn (slower, with the look of earlier
+              versions).  A function getting a chart description and returning
+              base64 encoded SVG renders charts by other means; it has to be
+              picklable when ``n_jobs`` is above 1.
+            * **chart_cache_dir** (*str*, default ``None``) — default template
+              only; directory of on-disk cache of rendered charts.  Charts with
+              the same counts and plotting parameters as in earlier runs are
+              read from the cache instead of being rendered again.  Charts of
+              a lambda or nested ``chart_backend`` function are not cached.
+            * **chart_cache_size** (*int*, default 100 MB) — maximum size of the
+              chart cache in bytes; least recently used charts are removed.
+            * **compress_crosstabs** (*bool*, default ``False``) — interactive
+              template only; embed the counts of the crosstabs of all pairs
+              deflate compressed, which makes reports of many columns and
+              categories several times smaller.  Needs a browser with
+              ``DecompressionStream`` (all current browsers).
+            * **sample** (*int* or *float*, default ``None``) — profile a random
+              sample of this many records (or of this fraction of records if
+              below 1).  Frequencies and association metrics are computed on the
+              sample and shown with 95% confidence intervals; categories the
+              sample missed are still listed, with zero count.
+            * **sample_seed** (*int*, default ``0``) — seed of the random sample
+              and of the bootstrap of association intervals.
+            * **verbose** (*bool* or *str*, default ``True``) — ``True`` shows
+              progress messages, ``False`` only warnings and errors and
+              ``'debug'`` also details of each column; other ``logging``
+              levels (like ``'warning'``) are accepted too.  Messages are logged by
+              the ``pandas_cat`` logger, printed to stdout unless the application
+              configured logging.
+            * **trace** (*bool* or *callable*, default ``False``) — collect a
+              :class:`ProfileTrace` with wall time and memory of each stage,
+              time spent on each pair of columns, numbers of charts and sizes
+              of report sections.  It is returned, and a callable is also
+              called with it once the report is written.
+
+        :returns: :class:`ProfileTrace` if the ``trace`` option is set, otherwise
+            ``None``.  The report is written to disk.
         """
-        self = pandas_cat
+        with _verbosity((opts or {}).get('verbose', True)):
+            return pandas_cat._run_profile(df, dataset_name, template, out_html, opts, ProfileTrace())
 
-        my_df = df
-        auto_prepare = True #default
+    @staticmethod
+    def profile_async(df: pandas.DataFrame = None, dataset_name: str = None, template: str = None,
+                      out_html: str = "report.html", opts: dict = None, executor=None):
+        """
+        Generate the report of :meth:`profile` in a background thread, without blocking the event loop.
 
-        if opts is not None:
-            if "auto_prepare" in opts:
-                if opts.get("auto_prepare") == False or opts.get("auto_prepare") == 0:
-                    auto_prepare = False
+        Must be called from a running event loop.  The run stops at the next
+        checkpoint (after each stage, each pair of columns and each chart)
+        once the job is cancelled, so abandoned jobs do not waste CPU.  Log
+        messages are not switched by the ``verbose`` option, they go to the
+        ``pandas_cat`` logger as configured by the application::
 
-        if auto_prepare:
-            print("Will auto prepare data...")
-            my_df = self.prepare(df=my_df, opts=opts)
-            print("... auto prepare data done.")
-            df = my_df
+            job = pandas_cat.profile_async(df, "Accidents", template="interactive")
+            async for progress in job:
+                print(f"{progress['step']}/{progress['steps']} {progress['stage']}")
+            await job
 
+        :param df: DataFrame or :class:`ProfileState`, see :meth:`profile`.
+        :param dataset_name: Title shown in the report header.
+        :param template: Report template, see :meth:`profile`.
+        :param out_html: Output filename, see :meth:`profile`.
+        :param opts: Options of :meth:`profile`.
+        :param executor: ``concurrent.futures.ThreadPoolExecutor`` to run the job in,
+            default executor of the event loop if ``None``.
 
-        # GENERATE INTERACTIVE REPORT
+        :returns: :class:`ProfileJob`, awaiting it returns the same as :meth:`profile`.
+        """
+        options = opts or {}
+        stages = pandas_cat._stage_names(df, template, out_html, options)
+
+        def run(checkpoint):
+            return pandas_cat._run_profile(df, dataset_name, template, out_html, opts, ProfileTrace(checkpoint))
+
+        return ProfileJob(run, stages, executor)
+
+    def _run_profile(df, dataset_name, template, out_html, opts, trace):
+        """Compute and render the report, return the trace if the ``trace`` option is set."""
+        trace_option = (opts or {}).get('trace', False)
+        result = pandas_cat._compute_profile(df, opts, trace)
+        if result is not None:
+            pandas_cat._render_html(result, dataset_name, template, out_html, opts, trace)
+        if not trace_option:
+            return None
+        if callable(trace_option):
+            trace_option(trace)
+        return trace
+
+    def _stage_names(df, template, out_html, options):
+        """Names of the stages of a profile run, in the order they are traced."""
+        stages = []
+        if not isinstance(df, ProfileState):
+            if options.get('sample') is not None:
+                stages.append('sample')
+            else:
+                if options.get('auto_prepare', True):
+                    stages.append('prepare')
+                stages.append('counts')
+        stages.append('associations')
         if template == 'interactive':
-            # Use default options if they were not specified by user
-            default_options = {'auto_prepare': True,
-                               'cat_limit': 20,
-                               'na_values': None, 'na_ignore': None, "keep_default_na": True}
-            options = default_options if opts is None else {
-                **default_options, **opts}
-
-            print('Progress 1/6: Handling missing values...')
-            df, detected_missings, replaced_counts = self.handle_missing_values(
-                df, options['na_values'], options['na_ignore'], options['keep_default_na'])
-
-            print('Progress 2/6: Preparing attribute profiles...')
-
-            # Storage for attribute profiles
-            attribute_profiles = []
-            excluded_attributes = []
-
-            # Iterate over each column in df
-            for column in df.columns:
-                # Count categories, respecting ordered categorical order
-                if hasattr(df[column], 'cat') and df[column].cat.ordered:
-                    categories_counts = df[column].value_counts().reindex(
-                        df[column].cat.categories, fill_value=0)
-                else:
-                    categories_counts = df[column].value_counts()
-                # If categories count is over the limit remove attribute
-                if len(categories_counts) > options['cat_limit']:
-                    removed_attribute_profile = {
-                        "attribute": column, "categories": len(categories_counts)}
-                    excluded_attributes.append(removed_attribute_profile)
-                    df.drop(column, axis=1, inplace=True)
-                    continue
-                # Count missing values
-                missing_count = df[column].isna().sum()
-                # Get RAM usage
-                formated_ram = self._humanbytes(
-                    df.memory_usage(deep=True)[column])
-                # Create profile for the attribute
-                profile = {
-                    'attribute': column,
-                    'categories': categories_counts.index.tolist(),
-                    'counts': [int(val) for val in categories_counts.values.tolist()],
-                    'percentages': [float(round((val / (categories_counts.values.sum() + missing_count)) * 100, 2)) for val in categories_counts.values.tolist()],
-                    'missing': int(missing_count),
-                    'ram': formated_ram,
-                    'detected': [str(val) for val in detected_missings[column]],
-                    'replaced': [int(val) for val in replaced_counts[column]]
-                }
-                # Store profile
-                attribute_profiles.append(profile)
-
-            print('Progress 3/6: Calculating overall correlations...')
-
-            # Storage for correlations
-            correlations_data = {}
-            correlations_data['Cramers V'] = []
-            correlations_data['Spearman Rank'] = []
-            correlations_data['Theils U'] = []
-
-            for column_one in df.columns:
-                for column_two in df.columns:
-                    # Calculate Cramer's V
-                    confusion_matrix = pd.crosstab(
-                        df[column_one], df[column_two])
-                    cramers_v = round(
-                        float(self._cramers_corrected_stat(confusion_matrix)), 3)
-                    entry_cramers = {"x": column_one,
-                                     "y": column_two, "v": cramers_v}
-                    correlations_data['Cramers V'].append(entry_cramers)
-
-                    # Convert categorical types to numeric codes for Spearman's correlation
-                    # cat.codes returns -1 for NA; replace with np.nan then mask.
-                    def _to_float_codes(series):
-                        codes = series.astype('category').cat.codes.to_numpy(dtype=float)
-                        codes[codes == -1] = np.nan
-                        return codes
-
-                    arr_one = _to_float_codes(df[column_one])
-                    arr_two = _to_float_codes(df[column_two])
-                    mask = ~(np.isnan(arr_one) | np.isnan(arr_two))
-
-                    # Calculate Spearman rank correlation
-                    if mask.sum() < 2:
-                        spearman_corr = 0.0
-                    else:
-                        spearman_corr, _ = ss.spearmanr(arr_one[mask], arr_two[mask])
-                    spearman_corr = round(float(spearman_corr), 3)
-                    entry_spearman = {"x": column_one,
-                                      "y": column_two, "v": spearman_corr}
-                    correlations_data['Spearman Rank'].append(entry_spearman)
-
-                    # Calculate Theil's U
-                    theils_u = round(float(self._theils_u(
-                        df[column_one], df[column_two])), 3)
-                    entry_theils_u = {"x": column_one,
-                                      "y": column_two, "v": theils_u}
-                    correlations_data['Theils U'].append(entry_theils_u)
-
-            print('Progress 4/6: Calculating individual correlations...')
-
-            # Iterate over each combination of columns
-            for i, column_one in enumerate(df.columns):
-                for j, column_two in enumerate(df.columns):
-                    confusion_matrix = pd.crosstab(
-                        df[column_one], df[column_two])
-                    crosstab_data = confusion_matrix.to_dict(orient='split')
-                    # Iterate over each combination of categories
-                    for k, category_one in enumerate(crosstab_data['index']):
-                        for l, category_two in enumerate(crosstab_data['columns']):
-                            correlation = float(crosstab_data['data'][k][l])
-                            entry = {"x": category_one,
-                                     "y": category_two, "v": correlation}
-                            key = f"{column_one} x {column_two}"
-                            if key not in correlations_data:
-                                correlations_data[key] = []
-                            correlations_data[key].append(entry)
-
-            print('Progress 5/6: Preparing html report...')
-
-            # Load Jinja2 template
-            env = Environment(loader=FileSystemLoader(
-                f"{os.path.dirname(__file__)}/templates/interactive"))
-            template = env.get_template('interactive.html')
-
-            # Ready input data for the template
-            data = {
-                'title': dataset_name or 'DataFrame',
-                'excluded_attributes': excluded_attributes,
-                'attribute_profiles': attribute_profiles,
-                'correlations_data': correlations_data,
-                'attribute_count': df.shape[1],
-                'records_count': df.shape[0],
-                'missing_count': df.isnull().sum().sum(),
-                'total_ram': self._humanbytes(df.memory_usage(deep=True).sum())
-            }
+            stages += ['attribute_profiles', 'overall_correlations', 'individual_correlations', 'render_html']
+        else:
+            stages += ['summary', 'attribute_profiles', 'overall_correlations', 'individual_correlations',
+                       'render_charts', 'render_html']
+        if out_html is not None:
+            stages.append('write')
+        return stages
 
-            # Render html using the template
-            html = template.render(**data)
+    @staticmethod
+    def compute_profile(df: pandas.DataFrame = None, opts: dict = None):
+        """
+        Compute everything a profile report shows, without rendering it.
 
-            # Write result in the file
-            report_dir = os.path.join(os.getcwd(), 'report')
-            if not os.path.exists(report_dir):
-                os.makedirs(report_dir)
-            filename = os.path.join(report_dir, out_html)
-            with open(filename, 'w') as f:
-                f.write(html)
+        Data are prepared (or sampled) and counted, and association metrics of
+        all pairs of columns are computed, in the same way as by
+        :meth:`profile`.  Reports of any template are then rendered from the
+        result by :meth:`render_html` and :meth:`ProfileResult.to_dict` exports
+        it, so several outputs share one computation.
 
-            print(
-                f'Progress 6/6: Report {dataset_name.lower()}.html finished...')
-            return
+        :param df: DataFrame to profile, or :class:`ProfileState` returned by
+            :meth:`profile_state` or :meth:`update`.
+        :param opts: Options of :meth:`profile`.  Options of rendering
+            (``render``, ``chart_cache_dir``, ...) are kept in the result as
+            defaults of :meth:`render_html`.
 
-        # GENERATE DEFAULT REPORT
-        my_df = df
-        if not (type(df) == pandas.core.frame.DataFrame):
-            print("Cannot profile. Parameter df is not a pandas dataframe.")
-            return
+        :returns: :class:`ProfileResult`, or ``None`` if ``df`` is not a DataFrame.
+        """
+        with _verbosity((opts or {}).get('verbose', True)):
+            return pandas_cat._compute_profile(df, opts, ProfileTrace())
+
+    @staticmethod
+    def render_html(result: ProfileResult = None, dataset_name: str = None, template: str = None,
+                    out_html: str = None, opts: dict = None):
+        """
+        Render an HTML report from a :class:`ProfileResult`.
+
+        :param result: Result of :meth:`compute_profile`.
+        :param dataset_name: Title shown in the report header.
+        :param template: Report template, see :meth:`profile`.
+        :param out_html: Output filename (basename only, no path).  If set, the
+            report is also written to ``<cwd>/report/<out_html>`` as by
+            :meth:`profile`.
+        :param opts: Options overriding those the result was computed with.
+            Only options of rendering take effect (``cat_limit`` may only
+            drop more columns); counts and metrics are not computed again.
+
+        :returns: HTML of the report.
+        """
+        options = {**result.options, **(opts or {})}
+        with _verbosity(options.get('verbose', True)):
+            return pandas_cat._render_html(result, dataset_name, template, out_html, opts, ProfileTrace())
+
+    def _compute_profile(df, opts, trace):
+        self = pandas_cat
+
+        if not isinstance(df, (pandas.DataFrame, ProfileState)):
+            logger.error("Cannot profile. Parameter df is not a pandas dataframe.")
+            return None
 
         # Use default options if they were not specified by user
         default_options = {'auto_prepare': True,
                            'cat_limit': 20,
-                           'na_values': None, 'na_ignore': None, "keep_default_na": True}
+                           'na_values': None, 'na_ignore': None, "keep_default_na": True,
+                           'na_case_insensitive': False, 'na_patterns': None,
+                           'theils_u_na_category': False,
+                           'n_jobs': 1, 'render': 'server', 'chart_backend': 'svg',
+                           'chart_cache_dir': None, 'chart_cache_size': 100 * 2**20,
+                           'compress_crosstabs': False,
+                           'sample': None, 'sample_seed': 0, 'high_cardinality': 'drop',
+                           'target': None, 'pairs': None}
         options = default_options if opts is None else {
             **default_options, **opts}
 
-        my_df, _, _ = self.handle_missing_values(
-            df, options['na_values'], options['na_ignore'], options['keep_default_na'])
+        if isinstance(df, ProfileState):
+            # counts were collected before, see profile_state() and update()
+            state = df
+            logger.info('Using profile state...')
+        else:
+            my_df = df
+            auto_prepare = True #default
+
+            if opts is not None:
+                if "auto_prepare" in opts:
+                    if opts.get("auto_prepare") == False or opts.get("auto_prepare") == 0:
+                        auto_prepare = False
+
+            if options['sample'] is not None:
+                logger.info('Sampling records and handling missing values...')
+                # data are prepared together with the sample, see _sample_state()
+                state = self._sample_state(df, options, auto_prepare, opts)
+                trace.lap('sample')
+            else:
+                if auto_prepare:
+                    logger.info("Will auto prepare data...")
+                    # the verbosity is set by the caller, profile_async() jobs leave the logger alone
+                    my_df = self._prepare(my_df, 'internal', opts)
+                    logger.info("... auto prepare data done.")
+                    df = my_df
+                    trace.lap('prepare')
+
+                logger.info('Handling missing values...')
+                # all counts of the report are collected here in one pass
+                state = self._collect_state(df, options)
+                trace.lap('counts')
+
+        logger.info('Calculating associations...')
+        # column profiles, contingency tables and association matrices shared by all templates
+        result = ProfileResult(state, options, trace)
+        trace.lap('associations')
+        return result
+
+    def _render_html(result, dataset_name, template, out_html, opts, trace):
+        """Render the report of the template, write it to ``report/<out_html>`` if set and return its HTML."""
+        options = {**result.options, **(opts or {})}
+        if template == 'interactive':
+            html = pandas_cat._render_interactive(result, dataset_name, options, trace)
+            markers = [('summary', 'id="summary"'), ('attributes', 'id="attributes"'),
+                       ('correlations', 'id="correlations"')]
+        else:
+            html = pandas_cat._render_default(result, dataset_name, options, trace)
+            markers = [('summary', 'id="summary"'), ('variables', 'id="headline_vars"'),
+                       ('correlations', 'id="corr"'), ('scripts', '<script>')]
+        trace.record_sections(html, markers)
+        if out_html is None:
+            return html
+
+        outdir = os.path.join(os.getcwd(), 'report')
+        # Check whether the specified path exists or not
+        if not os.path.exists(outdir):
+            # Create a new directory because it does not exist
+            os.makedirs(outdir)
+            logger.debug("The new directory is created!")
+        outname = os.path.join(outdir, out_html)
+        with open(outname, 'w') as f:
+            f.write(html)
+        trace.lap('write')
+        logger.info("Finished preparing profile report.")
+        logger.info(f"Your report is ready in file {outname}")
+        return html
+
+    def _render_interactive(result, dataset_name, options, trace):
+        self = pandas_cat
+        state = result.state
+        sampled = result.sampled
 
+        # GENERATE INTERACTIVE REPORT
+        logger.info('Progress 1/4: Preparing attribute profiles...')
+
+        # Storage for attribute profiles
+        attribute_profiles = []
+        excluded_attributes = []
+        columns = []
+
+        # Iterate over each column
+        for column in state.columns:
+            column_profile = result.column_profiles[column]
+            categories = column_profile.categories
+            # If categories count is over the limit remove attribute
+            if len(categories) > options['cat_limit'] and column not in state.bucketed or column in state.excluded:
+                removed_attribute_profile = {
+                    "attribute": column, "categories": len(categories) if column not in state.excluded
+                    else f"at least {state.distinct[column]:,}"}
+                excluded_attributes.append(removed_attribute_profile)
+                continue
+            columns.append(column)
+            # Order categories, respecting ordered categorical order, otherwise by frequency
+            order = column_profile.order()
+            # Get RAM usage
+            formated_ram = self._humanbytes(column_profile.memory)
+            # Create profile for the attribute
+            profile = {
+                'attribute': column,
+                'categories': [categories[k] for k in order],
+                'counts': [int(column_profile.counts[k]) for k in order],
+                'percentages': [float(round(column_profile.percentages[k], 2)) for k in order],
+                'missing': int(column_profile.missing),
+                'ram': formated_ram,
+                'detected': [str(val) for val in column_profile.detected],
+                'replaced': [int(val) for val in column_profile.detected.values()]
+            }
+            if sampled:
+                profile['intervals'] = [[float(round(bound, 2)) for bound in column_profile.intervals[k]]
+                                        for k in order]
+            # Store profile
+            attribute_profiles.append(profile)
+        trace.lap('attribute_profiles')
+
+        logger.info('Progress 2/4: Preparing overall correlations...')
+
+        # Correlations are embedded column-wise: names and categories once and flat arrays of values,
+        # main.js builds the entries of a matrix only when it is shown
+        correlations_data = {'columns': columns, 'metrics': {}, 'intervals': {} if sampled else None}
+
+        for metric, matrix in (('Cramers V', result.cramers_v), ('Spearman Rank', result.spearman),
+                               ('Theils U', result.theils_u)):
+            # row-major, the value of the pair (columns[i], columns[j]) is at i * len(columns) + j,
+            # none for pairs not selected by the target and pairs options
+            values = matrix.loc[columns, columns].to_numpy().ravel().tolist()
+            correlations_data['metrics'][metric] = [None if np.isnan(value) else round(value, 3) for value in values]
+            if sampled:
+                # lower and upper bound of each value, none for a column with itself
+                bounds = []
+                for column_one in columns:
+                    for column_two in columns:
+                        bounds.extend([round(bound, 3) for bound in result.intervals[(column_one, column_two)][metric]]
+                                      if (column_one, column_two) in result.intervals else [None, None])
+                correlations_data['intervals'][metric] = bounds
+        trace.lap('overall_correlations')
+
+        logger.info('Progress 3/4: Preparing individual correlations...')
+
+        # Counts of all category combinations of each pair once, the other order of the pair is its
+        # transpose: pairs (i, j) with i <= j one after another, rows follow categories of columns[i];
+        # with the target and pairs options only the selected pairs, listed in crosstabs['pairs']
+        pairs = [(i, j) for i in range(len(columns)) for j in range(i, len(columns))]
+        if result.pairs is not None:
+            positions = {column: i for i, column in enumerate(columns)}
+            pairs = sorted(tuple(sorted((positions[column_one], positions[column_two])))
+                           for column_one, column_two in result.pairs
+                           if column_one in positions and column_two in positions)
+        counts = []
+        for i, j in pairs:
+            pair_start = time.perf_counter()
+            counts.append(result.tables.table(columns[i], columns[j]).ravel())
+            trace.add_pair(columns[i], columns[j], time.perf_counter() - pair_start)
+        counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+        crosstabs = {'categories': [result.tables.categories[column].tolist() for column in columns]}
+        if result.pairs is not None:
+            crosstabs['pairs'] = [index for pair in pairs for index in pair]
+        if options['compress_crosstabs']:
+            # little-endian array, deflate compressed and base64 encoded; decompressed by the browser
+            dtype = 'uint32' if counts.max(initial=0) < 2**32 else 'float64'
+            raw = counts.astype('<u4' if dtype == 'uint32' else '<f8').tobytes()
+            crosstabs['dtype'] = dtype
+            crosstabs['counts'] = base64.b64encode(zlib.compress(raw)).decode('ascii')
+        else:
+            crosstabs['counts'] = counts.tolist()
+        correlations_data['crosstabs'] = crosstabs
+        trace.lap('individual_correlations')
+
+        logger.info('Progress 4/4: Preparing html report...')
+
+        # Load Jinja2 template, compiled once per process
+        env = _environment(f"{os.path.dirname(__file__)}/templates/interactive")
+        template = env.get_template('interactive.html')
+
+        # Ready input data for the template
+        data = {
+            'title': dataset_name or 'DataFrame',
+            'excluded_attributes': excluded_attributes,
+            'attribute_profiles': attribute_profiles,
+            'correlations_data': correlations_data,
+            'attribute_count': len(columns),
+            'records_count': state.n_rows,
+            'population_count': state.population,
+            'missing_count': sum(state.missing[column] for column in columns),
+            'total_ram': self._humanbytes(sum(state.memory[column] for column in columns) + state.index_memory)
+        }
+
+        # Render html using the template
+        html = template.render(**data)
+        trace.lap('render_html')
+        return html
+
+    def _render_default(result, dataset_name, options, trace):
+        self = pandas_cat
+        state = result.state
+        sampled = result.sampled
 
+        # GENERATE DEFAULT REPORT
         warning_info = []
+        if sampled:
+            warning_info.append({'type': 'alert-info', 'text': 'Profile of a random sample of '+f'{state.n_rows:,}'+' of '+f'{state.population:,}'+' records. Frequencies and correlations are estimated from the sample, with 95% confidence intervals. Categories not present in the sample are listed with zero count.'})
 
         # check limit on number of categories for each variable
 
-        limit = 20
-
-        if opts is not None:
-            if "cat_limit" in opts:
-                limit = opts.get("cat_limit")
-        print(f"Will limit to {limit} categories.")
+        limit = options['cat_limit']
+        logger.info(f"Will limit to {limit} categories.")
 
         to_drop = []
 
-        for var in df.columns:
-            dff = df[var]
-            lst = dff.unique()
-            cnt = len(lst)
-            print(f"...variable {var} has {cnt} categories")
-            if cnt > limit:
-                print(f"WARNING: variable {var} has been removed from profiling because it has {cnt} categories, which is over limit {
+        column_profiles = result.column_profiles
+        for var in state.columns:
+            # number of distinct values including the empty one
+            observed = len(column_profiles[var].observed)
+            cnt = column_profiles[var].n_categories
+            logger.debug(f"...variable {var} has {cnt} categories")
+            if var in state.excluded:
+                if cnt <= limit:
+                    logger.warning(f"WARNING: variable {var} has been removed from profiling because its profile state "
+                          f"was collected with lower limit of categories {state.options['cat_limit']}.")
+                    warning_info.append({'type': 'alert-warning', 'text': 'WARNING: variable '+var+' has been removed from profiling because its profile state was collected with lower limit of categories '+str(
+                        state.options['cat_limit'])+'.'})
+                else:
+                    logger.warning(f"WARNING: variable {var} has been removed from profiling because it has at least {cnt} categories, "
+                          f"which is over limit {limit}. Note you may increase the limit of allowed categories by setting the parameter cat_limit.")
+                    warning_info.append({'type': 'alert-warning', 'text': 'WARNING: variable '+var+' has been removed from profiling because it has at least '+str(
+                        cnt)+' categories, which is over the limit of '+str(limit)+' categories.<br> Note you may increase the limit of allowed categories by setting the parameter <i>cat_limit</i>.'})
+                to_drop.append(var)
+                continue
+            if var in state.bucketed:
+                logger.info(f"Variable {var} has more than {state.options['cat_limit']} categories, "
+                            f"other than the most frequent ones are counted as {ProfileState.other_category}.")
+                warning_info.append({'type': 'alert-info', 'text': 'Variable '+var+' has more than '+str(state.options['cat_limit'])+' categories, only the most frequent ones are profiled and other values are counted as <i>'+ProfileState.other_category+'</i> (none of them has more than '+f'{state.bucketed[var]:,}'+' records).'})
+            elif cnt > limit:
+                logger.warning(f"WARNING: variable {var} has been removed from profiling because it has {cnt} categories, which is over limit {
                       limit}. Note you may increase the limit of allowed categories by setting the parameter cat_limit.")
                 warning_info.append({'type': 'alert-warning', 'text': 'WARNING: variable '+var+' has been removed from profiling because it has '+str(
                     cnt)+' categories, which is over the limit of '+str(limit)+' categories.<br> Note you may increase the limit of allowed categories by setting the parameter <i>cat_limit</i>.'})
                 to_drop.append(var)
-            if cnt == 1 and lst[0] != lst[0]:
-                print(
+            if cnt == 1 and observed == 0:
+                logger.warning(
                     f"WARNING: variable {var} has been removed from profiling because it has only empty value.")
                 warning_info.append({'type': 'alert-warning', 'text': 'WARNING: variable ' +
                                     var+' has been removed from profiling because it has only empty value.'})
                 to_drop.append(var)
             if cnt == 0:
-                print(
+                logger.warning(
                     f"WARNING: variable {var} has been removed from profiling because it has {cnt} categories")
                 warning_info.append({'type': 'alert-warning', 'text': 'WARNING: variable '+var +
                                     ' has been removed from profiling because it has '+str(cnt)+' categories.'})
                 to_drop.append(var)
             # or isinstance(var,dict):
             if isinstance(var, list) or isinstance(var, tuple):
-                print(
+                logger.warning(
                     f"WARNING: variable {var} has been removed from profiling because it has unsupported type ({type(var)})")
                 warning_info.append({'type': 'alert-warning', 'text': 'WARNING: variable '+var +
                                     ' has been removed from profiling because it has unsupported type ('+type(var)+').'})
                 to_drop.append(var)
 
         if len(to_drop) > 0:
-            print(f"...will drop {to_drop}")
-            df = df.drop(columns=to_drop)
+            logger.info(f"...will drop {to_drop}")
+        varlist = [var for var in state.columns if var not in to_drop]
 
-        env = Environment(loader=FileSystemLoader(
-            os.path.dirname(__file__)+'/'+'templates'))
+        env = _environment(os.path.dirname(__file__)+'/'+'templates')
         indi_variables = []
 
         cntordr = 0
 
-        print("Preparing summary...")
-        size = df.memory_usage(deep=True).sum()
+        logger.info("Preparing summary...")
+        size = sum(state.memory[var] for var in varlist) + state.index_memory
         size_str = str(f'{self._humanbytes(size)}')
 
         df_summary = {}
-        df_summary['overall_table'] = {'Records': str(f'{len(df):,}'), 'Columns': str(
-            f'{len(df.columns):,}'), 'Memory usage': size_str}
-
-        varlist = df.columns
+        records = f'{state.n_rows:,} sampled of {state.population:,}' if sampled else str(f'{state.n_rows:,}')
+        df_summary['overall_table'] = {'Records': records, 'Columns': str(
+            f'{len(varlist):,}'), 'Memory usage': size_str}
 
         summ_vars = []
 
@@ -324,17 +1796,12 @@ class pandas_cat:
         lst_for_df = []
 
         for var in varlist:
-            dff = df[var]
-            var_size = dff.memory_usage(deep=True)
+            column_profile = column_profiles[var]
+            # memory usage of the column together with its index
+            var_size = column_profile.memory + column_profile.index_memory
             var_size_str = str(f'{self._humanbytes(var_size)}')
-            dfg = df.groupby(var)
-            cat_list = ""
-            cat_cnt = 0
-            for grp_name, grp_rows in dfg:
-                if cat_cnt > 0:
-                    cat_list = cat_list + ", "
-                cat_list = cat_list + str(grp_name)
-                cat_cnt += 1
+            cat_list = ", ".join(str(column_profile.categories[k]) for k in column_profile.observed)
+            cat_cnt = len(column_profile.observed)
             var_item = {'Attribute': var, 'Categories': cat_cnt, 'Categories_list': cat_list, 'Memory_usage': var_size,
                         'Memory_usage_hr': var_size_str}
             summ_vars.append(var_item)
@@ -365,83 +1832,65 @@ class pandas_cat:
             unit = "KB"
             tmp_val_for_chart = [x / 1000 for x in tmp_val_for_chart]
 
-        tmp_name_for_chart.insert(0, "Memory usage")
-        tmp_val_for_chart.insert(0, "")
-
-        tmp_val_for_chart2 = []
-        tmp_val_for_chart2.append(tmp_val_for_chart)
-
-        tmp_df2 = pd.DataFrame(tmp_val_for_chart2, columns=tmp_name_for_chart)
-
-        tmp_df2.plot(x='Memory usage', kind='bar', stacked=True,
-                     title='Memory usage by attribute')
-
-        # reordering the labels
-        handles, labels = plt.gca().get_legend_handles_labels()
-
-        # specify order
-        order = list(range(len(varlist)))
-        order.reverse()
-
-        # set legend and labels
-
-        plt.legend([handles[i] for i in order], [labels[i]
-                   for i in order], bbox_to_anchor=(1, 1), loc=2, borderaxespad=0.)
-        plt.tight_layout()
-        plt.ylabel('Size in ' + unit)
-
-        # save to stream
+        client_charts = None
+        memory_chart = {'kind': 'memory', 'labels': tmp_name_for_chart, 'values': tmp_val_for_chart, 'unit': unit}
+        if options['render'] == 'client':
+            # charts are drawn in the browser from the embedded counts
+            client_charts = {'memory': {'kind': 'bars', 'labels': [str(v) for v in tmp_name_for_chart],
+                                        'values': [float(v) for v in tmp_val_for_chart], 'decimals': 2,
+                                        'ylabel': 'Size in ' + unit}}
+            df_summary['mem_usg_svg'] = None
+        else:
+            df_summary['mem_usg_svg'] = self._render_charts([memory_chart], backend=options['chart_backend'])[0]
 
-        tmpfile = BytesIO()
-        plt.savefig(tmpfile, format='svg')
-        encoded = base64.b64encode(tmpfile.getvalue()).decode('utf-8')
-        df_summary['mem_usg_svg'] = encoded
+        logger.info("Preparing summary...done")
+        trace.lap('summary')
+        logger.info("Preparing individual profiles...")
 
-        print("Preparing summary...done")
-        print("Preparing individual profiles...")
+        # histograms and heatmaps are only described here and rendered at once at the end
+        charts = []
 
-        for i in df.columns:
-            df2 = df[[i]]
+        for i in varlist:
             cntordr += 1
-            for j in df2.columns:
-                fcont = self._plot_histogram(
-                    df2, j, sort=False, save=False, rotate=False)
-                df3 = df2.groupby(j)
+            for j in [i]:
+                column_profile = column_profiles[j]
+                categories = column_profile.categories
+                counts = column_profile.counts
 
-                is_ordered = False
+                # rendered together with all other charts below, empty values are shown as 'nan'
+                labels = [str(categories[k]) for k in column_profile.observed]
+                values = [int(counts[k]) for k in column_profile.observed]
+                if column_profile.missing > 0:
+                    labels.append('nan')
+                    values.append(0)
+                charts.append(self._histogram_chart(labels, np.array(values), rotate=False))
 
-                if isinstance(df[i].dtype, pd.CategoricalDtype):
-                    if df[i].cat.ordered:
-                        is_ordered = True
+                is_ordered = column_profile.ordered
 
-                most_frequent = None
-                for grp_name, grp_rows in df3:
-                    if most_frequent is None or most_frequent < len(grp_rows):
-                        most_frequent = len(grp_rows)
+                most_frequent = max(values)
 
                 freq_tbl = []
 
-                for grp_name, grp_rows in df3:
-                    pct = len(grp_rows) / len(df2) * 100
-                    fmt_width = len(grp_rows) / most_frequent * 100
+                for k in column_profile.observed:
+                    pct = column_profile.percentages[k]
+                    fmt_width = counts[k] / most_frequent * 100
                     pct_str = str(f'%.2f%%' % pct)
                     fmt_width_str = str(f'%.2f%%' % fmt_width)
 
-                    freq_tbl_item = {'name': grp_name, 'count': len(grp_rows), 'pct': pct_str, 'pct_num': pct,
-                                     'fmt_width': fmt_width_str}
+                    ci_str = str(f'%.2f–%.2f%%' % tuple(column_profile.intervals[k])) if sampled else None
+
+                    freq_tbl_item = {'name': categories[k], 'count': int(counts[k]), 'pct': pct_str, 'pct_num': pct,
+                                     'fmt_width': fmt_width_str, 'ci': ci_str}
                     freq_tbl.append(freq_tbl_item)
 
                 fn = j + ".svg"
                 summary = ""
                 summary_tbl = {}
-                summary += "Categories : " + str(len(df2[j].unique())) + "<br>"
-                summary_tbl['Categories'] = str(len(df2[j].unique()))
-                idxmax = df[j].value_counts().idxmax()
-                idxmin = df[j].value_counts().idxmin()
-                cnt_max = len(df2[df2[j] == idxmax])
-                pct_max = cnt_max / len(df2) * 100
-                cnt_min = len(df2[df2[j] == idxmin])
-                pct_min = cnt_min / len(df2) * 100
+                n_unique = column_profile.n_categories
+                summary += "Categories : " + str(n_unique) + "<br>"
+                summary_tbl['Categories'] = str(n_unique)
+                idxmax, cnt_max, pct_max = column_profile.extreme(column_profile.most_frequent)
+                idxmin, cnt_min, pct_min = column_profile.extreme(column_profile.least_frequent)
                 summary += "Most frequent : " + str(idxmax) + " (" + str(f'{cnt_max:,}') + " values, " + str(
                     f'%.2f%%' % pct_max) + ")<br>"
                 summary_tbl['Most frequent'] = str(idxmax) + " (" + str(f'{cnt_max:,}') + " values, " + str(
@@ -450,86 +1899,121 @@ class pandas_cat:
                     f'%.2f%%' % pct_min) + ")<br>"
                 summary_tbl['Least frequent'] = str(idxmin) + " (" + str(f'{cnt_min:,}') + " values, " + str(
                     f'%.2f%%' % pct_min) + ")"
-                size = df2.memory_usage(deep=True).sum()
+                size = column_profile.memory + column_profile.index_memory
                 size_str = str(f'{self._humanbytes(size)}')
                 summary_tbl['mem_usage'] = size_str
-                missings = df2[j].isna().sum()
-                missings_pct = missings / len(df2) * 100
+                missings = column_profile.missing
+                missings_pct = column_profile.missing_percentage
                 summary += "Missings: " + \
                     str(f'{missings:,}') + \
                     " (" + str(f'%.2f%%' % missings_pct) + ")<br>"
                 summary_tbl['Missings'] = str(
                     f'{missings:,}') + " (" + str(f'%.2f%%' % missings_pct) + ")"
-                d = {'varname': j, 'is_ordered': is_ordered, 'freq_table': None, 'freq_chart': None, 'fname': fn, 'fcont': fcont,
+                if sampled:
+                    summary_tbl['Missings'] += str(f' 95%% CI %.2f–%.2f%%' % tuple(column_profile.missing_interval))
+                d = {'varname': j, 'is_ordered': is_ordered, 'freq_table': None, 'freq_chart': None, 'fname': fn, 'fcont': None,
                      'cnt': cntordr, 'summary': summary, 'summary_tbl': summary_tbl, 'freq_tbl': freq_tbl}
                 indi_variables.append(d)
 
-        print("Preparing individual profiles...done")
-        print("Preparing overall correlations...")
-
-        # https://stackoverflow.com/questions/20892799/using-pandas-calculate-cram%C3%A9rs-coefficient-matrix
-        dict_cramer = {'col1': [], 'col2': [], 'cnt': []}
-        df_cramer = pd.DataFrame(dict_cramer)
-
-        for i in df.columns:
-            for j in df.columns:
-                confusion_matrix = pd.crosstab(df[i], df[j])
-                cr = self._cramers_corrected_stat(
-                    confusion_matrix=confusion_matrix)
-                df2 = pd.DataFrame({'col1': [i], 'col2': [j], 'cnt': [cr]})
-                # df_cramer.append(df2,ignore_index=True)
-                df_cramer = pd.concat(
-                    [df_cramer, df2], axis=0, ignore_index=True)
-        ct = pd.crosstab(df_cramer['col1'], df_cramer['col2'],
-                         values=df_cramer['cnt'], aggfunc='mean')
-        plt.figure(figsize=(16, 4))
-        sns.heatmap(ct, annot=True, cmap='Blues', fmt='.2f', linewidth=1)
-        tmpfile_c_o = BytesIO()
-        plt.savefig(tmpfile_c_o, format='svg')
-        plt.close()
-        encoded_c_o = base64.b64encode(tmpfile_c_o.getvalue()).decode('utf-8')
-        overall_corr = encoded_c_o
+        logger.info("Preparing individual profiles...done")
+        trace.lap('attribute_profiles')
+        logger.info("Preparing overall correlations...")
 
-        print("Preparing overall correlations...done")
-        print("Preparing individual correlations...")
-        indiv_corr = {}
+        # All pairwise statistics and heatmaps below read the same contingency tables of the state
+        tables = result.tables
 
-        for i in df.columns:
-            print(f"... for variable {i}...")
+        # Cramer's V of all pairs, sorted by names as before
+        cramers_matrix = result.cramers_v.loc[varlist, varlist]
+        ct = cramers_matrix.rename_axis(index='col1', columns='col2')
+        ct = ct.sort_index().sort_index(axis=1)
+        charts.append(self._heatmap_chart(ct, fmt='.2f', linewidth=1))
+
+        logger.info("Preparing overall correlations...done")
+        trace.lap('overall_correlations')
+        logger.info("Preparing individual correlations...")
+        indiv_corr = {}
+        # error bounds of Cramer's V of a sample, shown next to the names of pairs
+        intervals = None
+        if sampled:
+            intervals = {i: {} for i in varlist}
+            for i in varlist:
+                for j in varlist:
+                    if i != j and (i, j) in result.intervals:
+                        intervals[i][j] = "Cramer's V %.2f (95%% CI %.2f–%.2f)" % (
+                            cramers_matrix.loc[i, j], *result.intervals[(i, j)]['Cramers V'])
+
+        # crosstabs of the pairs selected by the target and pairs options only
+        selected = None if result.pairs is None else {frozenset(pair) for pair in result.pairs}
+        for i in varlist:
+            logger.debug(f"... for variable {i}...")
             dict = {'varname': i}
             dict2 = {}
-            for j in df.columns:
-                ct = pd.crosstab(df[i], df[j])
-                print(f"...... doing crosstab {i} x {j}")
-                plt.figure(figsize=(16, 4))
-                sns.heatmap(ct, annot=True, cmap='Blues', fmt='g')
-                tmpfile_c_i = BytesIO()
-                plt.savefig(tmpfile_c_i, format='svg')
-                plt.close()
-                encoded_c_i = base64.b64encode(
-                    tmpfile_c_i.getvalue()).decode('utf-8')
-                dict2[j] = encoded_c_i
+            for j in varlist:
+                if selected is not None and frozenset((i, j)) not in selected:
+                    continue
+                pair_start = time.perf_counter()
+                ct = tables.crosstab(i, j)
+                logger.debug(f"...... doing crosstab {i} x {j}")
+                charts.append(self._heatmap_chart(ct, fmt='g'))
+                dict2[j] = None
+                trace.add_pair(i, j, time.perf_counter() - pair_start)
 
             dict['vars'] = dict2
-            indiv_corr[i] = dict
+            if dict2:
+                indiv_corr[i] = dict
+
+        logger.info("Preparing individual correlations...done.")
+        trace.lap('individual_correlations')
+
+        cache = None
+        if client_charts is None:
+            logger.info(f"Rendering {len(charts)} charts...")
+            if options['chart_cache_dir'] is not None:
+                if _ChartCache.name_of(options['chart_backend']) is None:
+                    logger.info("Charts of an anonymous chart_backend function are not cached.")
+                else:
+                    cache = _ChartCache(options['chart_cache_dir'], options['chart_cache_size'],
+                                        backend=options['chart_backend'])
+            durations = []
+            rendered = self._render_charts(charts, n_jobs=options['n_jobs'], cache=cache, durations=durations,
+                                           checkpoint=trace.checkpoint, backend=options['chart_backend'])
+            if cache is not None:
+                logger.info(f"Chart cache {cache.directory}: {cache.hits} hits, {cache.misses} misses.")
+            trace.charts['cached'] = cache.hits if cache is not None else 0
+            trace.charts['rendered'] = len(charts) - trace.charts['cached']
+            # heatmaps of pairs follow the histograms and the overall heatmap
+            pair_durations = iter(durations[len(indi_variables) + 1:])
+            for i in indiv_corr:
+                for j in indiv_corr[i]['vars']:
+                    trace.add_pair(i, j, next(pair_durations))
+        else:
+            # embed only the counts, charts are drawn in the browser
+            logger.info(f"Embedding data of {len(charts)} charts...")
+            rendered = [self._chart_data(chart) for chart in charts]
+            trace.charts['embedded'] = len(charts)
+
+        # charts come back in the order they were added: histograms, overall heatmap, individual heatmaps
+        rendered = iter(rendered)
+        for d in indi_variables:
+            d['fcont'] = next(rendered)
+        overall_corr = next(rendered)
+        for i in indiv_corr:
+            for j in indiv_corr[i]['vars']:
+                indiv_corr[i]['vars'][j] = next(rendered)
+
+        if client_charts is not None:
+            client_charts['histograms'] = {d['varname']: d['fcont'] for d in indi_variables}
+            client_charts['overall'] = overall_corr
+            client_charts['crosstabs'] = {i: indiv_corr[i]['vars'] for i in indiv_corr}
 
         corr = {}
         corr['overall_corr'] = overall_corr
         corr['indiv_corr'] = indiv_corr
+        corr['intervals'] = intervals
 
-        print("Preparing individual correlations...done.")
-        print("Preparing output file...")
-
-        fname = out_html
-
-        outdir = os.path.join(os.getcwd(), 'report')
-        # Check whether the specified path exists or not
-        isExist = os.path.exists(outdir)
-        if not isExist:
-            # Create a new directory because it does not exist
-            os.makedirs(outdir)
-            print("The new directory is created!")
-        outname = os.path.join(os.getcwd(), 'report', fname)
+        logger.info("Rendering charts...done.")
+        trace.lap('render_charts')
+        logger.info("Preparing output file...")
 
         # Load the template from the Environment
 
@@ -545,20 +2029,442 @@ class pandas_cat:
                                df_summary=df_summary,
                                indi_variables=indi_variables,
                                corr=corr,
+                               client_charts=client_charts,
                                version_string=pandas_cat.version_string
                                )
+        trace.lap('render_html')
+        return html
 
-        with open(outname, 'w') as f:
-            f.write(html)
-        print("Preparing output file ...done")
-        print("Finished preparing profile report.")
-        print(f"Your report is ready in file {outname}")
+    @staticmethod
+    def association_matrix(df: pandas.DataFrame = None, metric: str = "cramers_v", cat_limit: int = 20):
+        """
+        Compute association between all pairs of columns at once.
+
+        All columns are one-hot encoded into one sparse indicator matrix and
+        the Burt matrix (its cross product) is computed by a single matrix
+        multiplication.  Statistics of all pairs are then derived from it
+        with vectorized operations, which makes datasets with many columns
+        practical.
+
+        :param df: DataFrame with categorical columns or :class:`ProfileState`
+            (columns over its ``cat_limit`` are left out, pairs not selected by
+            its ``target`` and ``pairs`` options are NaN).  Missing values are
+            excluded pairwise, same as in ``pd.crosstab``.
+        :param metric: Association metric, ``'cramers_v'`` (bias corrected
+            Cramer's V) or ``'theils_u'`` (Theil's U, the cell at row ``x``
+            and column ``y`` is U(x|y)).
+        :param cat_limit: Maximum categories of a column of a DataFrame, as in
+            :meth:`profile`; the Burt matrix grows with the square of the number
+            of all categories.  ``None`` for no limit.  Not used for a
+            :class:`ProfileState`, which has its own.
+
+        :returns: Square DataFrame indexed by column names in both axes.
+
+        :raises ValueError: If the metric is not supported or a column of the DataFrame is over ``cat_limit``.
+        """
+        pairs = None
+        if isinstance(df, ProfileState):
+            tables = _ContingencyTables.from_state(df)
+            pairs = ProfileState._selected_pairs(df.options, df.columns, tables.columns)
+        else:
+            tables = _ContingencyTables(df)
+            over = [column for column in tables.columns
+                    if cat_limit is not None and len(tables.categories[column]) > cat_limit]
+            if over:
+                raise ValueError(f"Columns {over} have more than {cat_limit} categories, "
+                                 f"drop them or use a higher cat_limit.")
+        if metric == "cramers_v":
+            return pandas_cat._cramers_v_matrix(tables, pairs=pairs)
+        if metric == "theils_u":
+            return pandas_cat._theils_u_matrix(tables, pairs=pairs)
+        raise ValueError(f"Unsupported metric {metric}, use 'cramers_v' or 'theils_u'.")
+
+    @staticmethod
+    def profile_state(df: pandas.DataFrame = None, opts: dict = None):
+        """
+        Collect counts of a dataset, from which the report can be generated later.
+
+        Data are prepared (when ``auto_prepare`` is set) and missing values are
+        replaced in the same way as in :meth:`profile`.  The state can be
+        extended by new rows by :meth:`update`, saved by
+        :meth:`ProfileState.save` and passed to :meth:`profile` or
+        :meth:`association_matrix` instead of the DataFrame.
+
+        :param df: DataFrame to profile.
+        :param opts: Options of :meth:`profile`; ``auto_prepare``, ``cat_limit``,
+            ``na_values``, ``na_ignore``, ``keep_default_na``, ``na_case_insensitive``,
+            ``na_patterns``, ``n_jobs``
+            (rows are split into shards counted by a process pool), ``sample``,
+            ``sample_seed`` and ``high_cardinality`` are used.  States of a sample cannot be updated.
+
+        :returns: :class:`ProfileState` of the dataset.
+        """
+        options = opts or {}
+        with _verbosity(options.get('verbose', True)):
+            if options.get('sample') is not None:
+                return pandas_cat._sample_state(df, options, options.get("auto_prepare", True), opts)
+            if options.get("auto_prepare", True):
+                df = pandas_cat._prepare(df, 'internal', opts)
+            return pandas_cat._collect_state(df, options)
+
+    @staticmethod
+    def update(state: ProfileState = None, new_rows: pandas.DataFrame = None):
+        """
+        Add new rows to the profile state.
+
+        Only the new rows are processed, with the options the state was
+        collected with.  The new rows are not prepared, their values are
+        matched to existing categories by their string representation and
+        new values are added as new categories.
+
+        :param state: State returned by :meth:`profile_state` or an earlier :meth:`update`.
+        :param new_rows: DataFrame with the same columns as the profiled dataset.
+
+        :returns: New :class:`ProfileState` with counts of all rows.
+
+        :raises ValueError: If the columns differ from the profiled dataset.
+        """
+        return state.merge(ProfileState.from_frame(new_rows, state.options))
+
+    @staticmethod
+    def profile_file(path: str = None, dataset_name: str = None, template: str = None, out_html: str = "report.html",
+                     opts: dict = None, chunksize: int = 100000, read_opts: dict = None):
+        """
+        Profile a CSV or Parquet file which does not have to fit into memory and write an HTML report.
+
+        The file is read in chunks of ``chunksize`` rows.  Missing values of
+        each chunk are replaced and the chunk is reduced to category counts
+        and contingency tables, which are merged (see :class:`ProfileState`),
+        so peak memory is bounded by the chunk size and the number of
+        categories, not by the number of rows.  Columns over ``cat_limit``
+        keep no categories (or only their most frequent ones, see
+        ``high_cardinality``), however many distinct values they have.  With ``auto_prepare`` the
+        ordinal categories are ordered once all values are known.
+
+        :param path: Path to the file.  Files ending with ``.parquet`` or ``.pq``
+            are read as Parquet (requires ``pyarrow``), other files as CSV
+            (compressed files are supported as in ``pd.read_csv``).
+        :param dataset_name: Title shown in the report header.
+        :param template: Report template, see :meth:`profile`.
+        :param out_html: Output filename, see :meth:`profile`.
+        :param opts: Options of :meth:`profile`.
+        :param chunksize: Number of rows read at once.
+        :param read_opts: Additional keyword arguments of ``pd.read_csv``
+            (e.g. ``sep``, ``encoding``, ``usecols``) or ``columns`` for Parquet.
+            CSV values are read as categories of strings and without pandas
+            missing value detection, which is done by :meth:`handle_missing_values`.
+
+        :returns: :class:`ProfileState` of the file.  The report is written to disk.
+        """
+        options = opts or {}
+        state = ProfileState(options)
+        with _verbosity(options.get('verbose', True)):
+            for chunk in pandas_cat._read_chunks(path, chunksize, read_opts or {}):
+                state = state.merge(ProfileState.from_frame(chunk, options))
+                logger.debug(f"...read {state.n_rows} rows")
+            if options.get("auto_prepare", True):
+                pandas_cat._prepare_state(state)
+        pandas_cat.profile(df=state, dataset_name=dataset_name, template=template, out_html=out_html, opts=opts)
+        return state
+
+    @staticmethod
+    def profile_many(inputs=None, template: str = None, opts: dict = None, n_jobs: int = 1,
+                     chunksize: int = 100000, read_opts: dict = None):
+        """
+        Profile many datasets and write one HTML report per dataset.
+
+        Datasets are profiled by a pool of ``n_jobs`` worker processes which
+        is started once, with the template compiled (and matplotlib loaded
+        if the ``chart_backend`` option selects it), and reused for all datasets.  A failure of one dataset does
+        not stop the others; results and failures are summarized at the end.
+
+        :param inputs: List of datasets: paths of CSV or Parquet files (profiled
+            by :meth:`profile_file`), DataFrames or :class:`ProfileState`
+            objects.  A dictionary maps dataset names to datasets.  Datasets
+            are named by their file names without extension or by their
+            position in the list, the report of each is ``report/<name>.html``.
+        :param template: Report template, see :meth:`profile`.
+        :param opts: Options of :meth:`profile`, used for all datasets;
+            ``verbose`` defaults to ``False`` for the reports, progress of
+            the batch is shown unless it is set to ``False``.
+        :param n_jobs: Number of worker processes, ``-1`` uses all CPUs and
+            ``1`` profiles the datasets one by one in this process.
+        :param chunksize: Rows read at once from files, see :meth:`profile_file`.
+        :param read_opts: Arguments of reading files, see :meth:`profile_file`.
+
+        :returns: List of dicts in the order of ``inputs`` with ``dataset``
+            name, path of the ``report``, ``seconds`` and ``error`` (``None``
+            or the error message).
+        """
+        options = opts or {}
+        items = pandas_cat._batch_items(inputs)
+        # reports of many datasets are quiet, the batch reports each dataset once it is done
+        report_opts = {**options, 'verbose': 'debug' if options.get('verbose') == 'debug' else False}
+        args = (template, report_opts, chunksize, read_opts)
+        if n_jobs is None or n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        results = [None] * len(items)
+        with _verbosity(options.get('verbose', True)):
+            def done(i, result):
+                results[i] = result
+                finished = sum(result is not None for result in results)
+                if result['error'] is None:
+                    logger.info(f"[{finished}/{len(items)}] {result['dataset']}: {result['report']} "
+                                f"({result['seconds']:.1f} s)")
+                else:
+                    logger.warning(f"[{finished}/{len(items)}] {result['dataset']} failed: {result['error']}")
+
+            if n_jobs <= 1 or len(items) <= 1:
+                pandas_cat._warm_worker(template, report_opts)
+                for i, item in enumerate(items):
+                    done(i, pandas_cat._profile_one(item, *args))
+            else:
+                with ProcessPoolExecutor(max_workers=min(n_jobs, len(items)), initializer=pandas_cat._warm_worker,
+                                         initargs=(template, report_opts)) as executor:
+                    futures = {executor.submit(pandas_cat._profile_one, item, *args): i
+                               for i, item in enumerate(items)}
+                    for future in as_completed(futures):
+                        done(futures[future], future.result())
+
+            failed = [result for result in results if result['error'] is not None]
+            logger.info(f"Profiled {len(results) - len(failed)} of {len(results)} datasets "
+                        f"in {sum(result['seconds'] for result in results):.1f} s of work.")
+            for result in failed:
+                logger.warning(f"FAILED {result['dataset']}: {result['error']}")
+        return results
+
+    def _batch_items(inputs):
+        """Return ``(name, dataset, out_html)`` of datasets of :meth:`profile_many`, report names are unique."""
+        if isinstance(inputs, dict):
+            named = [(str(name), data) for name, data in inputs.items()]
+        else:
+            named = []
+            for i, data in enumerate(inputs or []):
+                if isinstance(data, (str, os.PathLike)):
+                    name = os.path.basename(os.fspath(data))
+                    for suffix in ('.gz', '.bz2', '.xz', '.zip', '.zst'):
+                        name = name.removesuffix(suffix)
+                    name = os.path.splitext(name)[0]
+                else:
+                    name = f'dataset_{i + 1}'
+                named.append((name, data))
+        items = []
+        used = set()
+        for name, data in named:
+            out_name = re.sub(r'[^\w.-]+', '_', name) or 'dataset'
+            candidate, k = out_name, 1
+            while candidate.lower() in used:
+                k += 1
+                candidate = f'{out_name}_{k}'
+            used.add(candidate.lower())
+            items.append((name, data, candidate + '.html'))
+        return items
+
+    def _warm_worker(template, opts):
+        """
+        Compile the report template once, before the first dataset of :meth:`profile_many`.
+
+        matplotlib and seaborn are imported too if they draw the charts,
+        the native SVG charts need nothing more.
+        """
+        if template == 'interactive':
+            _environment(f"{os.path.dirname(__file__)}/templates/interactive").get_template('interactive.html')
+            return
+        _environment(os.path.dirname(__file__) + '/' + 'templates').get_template(pandas_cat.template_name)
+        if opts.get('chart_backend') == 'matplotlib' and opts.get('render', 'server') == 'server':
+            import matplotlib.pyplot  # noqa: F401
+            import seaborn  # noqa: F401
+
+    def _profile_one(item, template, opts, chunksize, read_opts):
+        """Profile one dataset of :meth:`profile_many`, also runs in worker processes; errors are returned."""
+        name, data, out_html = item
+        start = time.perf_counter()
+        error = None
+        try:
+            if isinstance(data, (pandas.DataFrame, ProfileState)):
+                pandas_cat.profile(df=data, dataset_name=name, template=template, out_html=out_html, opts=opts)
+            elif isinstance(data, (str, os.PathLike)):
+                pandas_cat.profile_file(os.fspath(data), dataset_name=name, template=template, out_html=out_html,
+                                        opts=opts, chunksize=chunksize, read_opts=read_opts)
+            else:
+                raise TypeError(f"Unsupported dataset of type {type(data).__name__}, use a path or a DataFrame.")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return {'dataset': name, 'report': os.path.join(os.getcwd(), 'report', out_html),
+                'seconds': time.perf_counter() - start, 'error': error}
+
+    def _collect_state(df, options):
+        """
+        Collect the profile state of a DataFrame, in shards of rows by a process pool when ``n_jobs`` > 1.
+
+        Each worker returns the state of its shard, category dictionaries of
+        the shards are unified when the states are merged.
+        """
+        n_jobs = options.get('n_jobs', 1)
+        if n_jobs is None or n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs <= 1 or len(df) < 2 * n_jobs:
+            return ProfileState.from_frame(df, options)
+        bounds = np.linspace(0, len(df), n_jobs + 1).astype(int)
+        shards = [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            states = list(executor.map(ProfileState.from_frame, shards, [options] * len(shards)))
+        state = ProfileState.merge_all(states)
+        state.index_memory = int(df.index.memory_usage(deep=True))
+        is_missing = state._missing_rule()
+        for column in df.columns:
+            series = df[column]
+            # every shard holds its own copy of the categories, and numbers of a shard without tokens are
+            # not turned into objects as in the whole column, only the memory of other columns adds up
+            if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype.kind in 'iub':
+                state.memory[column] = ProfileState._memory_usage(series, ProfileState._tokens(series, is_missing))
+        return state
+
+    def _sample_state(df, options, auto_prepare=True, opts=None):
+        """
+        Collect the profile state of a random sample of rows of a DataFrame.
+
+        ``sample`` rows (or a fraction of rows if it is below 1) are drawn
+        uniformly without replacement with the ``sample_seed`` seed.  Distinct
+        values of each column are found in one pass over all rows; one row per
+        value the sample missed is prepared together with the sample, so these
+        values get the same categories as in the whole dataset and are listed
+        with zero count, but they are not counted.  Memory usage is
+        extrapolated to all rows.
+
+        :raises ValueError: If ``sample`` is neither a positive number of rows nor a fraction between 0 and 1.
+        """
+        n = len(df)
+        sample = options.get('sample')
+        if isinstance(sample, float) and 0 < sample < 1:
+            size = max(1, int(round(sample * n)))
+        elif isinstance(sample, (int, np.integer)) and not isinstance(sample, bool) and sample > 0:
+            size = int(sample)
+        else:
+            raise ValueError(f"Unsupported sample {sample!r}, use a number of rows or a fraction between 0 and 1.")
+        if size >= n:
+            if auto_prepare:
+                df = pandas_cat._prepare(df, 'internal', opts)
+            return pandas_cat._collect_state(df, options)
+
+        rng = np.random.default_rng(options.get('sample_seed', 0))
+        positions = np.sort(rng.choice(n, size, replace=False))
+        index_memory = int(df.index.memory_usage(deep=True))
+        rows = {}
+        n_unsampled = {}
+        for column in df.columns:
+            try:
+                codes = pd.factorize(df[column])[0]
+            except TypeError:
+                # unhashable values, only the sample is profiled
+                codes = np.full(n, -1)
+            first = pandas_cat._first_occurrences(codes)
+            if len(first) != codes.max() + 1:
+                _, first = np.unique(codes[codes >= 0], return_index=True)
+                first = np.flatnonzero(codes >= 0)[first]
+            in_sample = np.zeros(len(first), dtype=bool)
+            sampled_codes = codes[positions]
+            in_sample[sampled_codes[sampled_codes >= 0]] = True
+            rows[column] = first[~in_sample]
+            n_unsampled[column] = len(rows[column])
+        # columns are aligned by repeating a sampled row, these extra rows are cut off before counting
+        length = max(n_unsampled.values(), default=0)
+        df = pd.DataFrame({column: df[column].iloc[np.concatenate(
+            (positions, rows[column], np.repeat(positions[:1], length - n_unsampled[column])))].reset_index(drop=True)
+            for column in df.columns})
+        logger.info(f"Profiling a sample of {size:,} of {n:,} records, {length:,} rows added for values not in the sample.")
+        if auto_prepare:
+            df = pandas_cat._prepare(df, 'internal', opts)
+
+        memory = {}
+        unsampled = {}
+        is_missing = ProfileState(options)._missing_rule()
+        for column in df.columns:
+            sampled = df[column].iloc[:size]
+            memory[column] = ProfileState._memory_usage(sampled, ProfileState._tokens(sampled, is_missing))
+            if isinstance(sampled.dtype, pd.CategoricalDtype):
+                # categories are stored once, only the codes grow with the number of rows
+                codes_memory = sampled.cat.codes.to_numpy().nbytes
+                memory[column] += int(codes_memory * (n / size - 1))
+            else:
+                memory[column] = int(memory[column] * n / size)
+                # keep the values missed by the sample as (unused) categories
+                try:
+                    df[column] = df[column].astype('category')
+                except TypeError:
+                    pass
+            unsampled[column] = {str(value) for value in df[column].iloc[size:size + n_unsampled[column]]
+                                 if not pd.isna(value)}
+
+        state = pandas_cat._collect_state(df.iloc[:size], options)
+        state.population = n
+        state.index_memory = index_memory
+        for column in state.columns:
+            state.memory[column] = memory[column]
+            # categories replaced as missing values are not in the state any more
+            state.unsampled[column] = [str(category) for category, count in
+                                       zip(state.categories[column], state.counts[column])
+                                       if count == 0 and str(category) in unsampled[column]]
+        for column in state.columns:
+            if column not in state.excluded and np.count_nonzero(state.counts[column]) \
+                    + len(state.unsampled[column]) > state.options['cat_limit']:
+                state._exclude(column, np.count_nonzero(state.counts[column]) + len(state.unsampled[column]))
+        state.excluded = [column for column in state.columns if column in state.distinct]
+        state.tables = {pair: table for pair, table in state.tables.items()
+                        if pair[0] not in state.excluded and pair[1] not in state.excluded}
+        return state
+
+    def _read_chunks(path, chunksize, read_opts):
+        if str(path).lower().endswith(('.parquet', '.pq')):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, **read_opts):
+                yield batch.to_pandas()
+        else:
+            # categories keep chunks small and missing values are removed from categories, not searched in values
+            read_opts = {'dtype': 'category', 'keep_default_na': False, **read_opts}
+            with pd.read_csv(path, chunksize=chunksize, **read_opts) as reader:
+                yield from reader
+
+    def _prepare_state(state):
+        """
+        Order categories of a state in the same way as :meth:`prepare` orders columns of a DataFrame.
+
+        :meth:`prepare` runs before missing values are replaced, so the
+        detected missing value tokens are converted together with the
+        categories; a token which keeps a column of a DataFrame unordered
+        keeps it unordered here as well.
+        """
+        columns = [column for column in state.columns
+                   if state.categories[column] and not state.ordered[column] and column not in state.bucketed]
+        if not columns:
+            return
+        values = {column: [str(category) for category in state.categories[column]]
+                  + [token for token, count in state.detected[column].items() if count and token != 'pandas.NAN']
+                  for column in columns}
+        # only the distinct values are converted, repeating the last one keeps their set while aligning the lengths
+        length = max(len(column_values) for column_values in values.values())
+        df = pd.DataFrame({column: column_values + [column_values[-1]] * (length - len(column_values))
+                           for column, column_values in values.items()})
+        pandas_cat._automatic_data_conversions(df)
+        for column in columns:
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                continue
+            codes = df[column].cat.codes.to_numpy()[:len(state.categories[column])]
+            if (codes < 0).any():
+                continue
+            # categories made of the tokens only are removed as missing values, same as in a DataFrame
+            used = np.unique(codes)
+            positions = np.full(len(df[column].cat.categories), -1, dtype=np.intp)
+            positions[used] = np.arange(len(used))
+            state.recode(column, df[column].cat.categories[used].tolist(), positions[codes], ordered=True)
 
     def _cramers_corrected_stat(confusion_matrix):
         """ calculate Cramers V statistic for categorial-categorial association.
             uses correction from Bergsma and Wicher,
             Journal of the Korean Statistical Society 42 (2013): 323-328
         """
+        import scipy.stats as ss
+
         chi2 = ss.chi2_contingency(confusion_matrix)[0]
         n = confusion_matrix.sum().sum()
         phi2 = chi2 / n
@@ -573,67 +2479,555 @@ class pandas_cat:
 
         return np.sqrt(phi2corr / denominator)
 
-    def _theils_u(x, y):
-        """Calculate Theil's U statistic for categorical-categorical association."""
-        from collections import Counter
-        import math
+    def _matrix_cells(columns, pairs=None):
+        """
+        Return cells ``(i, j)``, ``i <= j``, of a symmetric matrix of columns to compute.
 
-        def conditional_entropy(x, y):
-            """Calculates conditional entropy."""
-            y_counter = Counter(y)
-            xy_counter = Counter(list(zip(x, y)))
-            total_occurrences = sum(y_counter.values())
-            entropy = 0
-            epsilon = np.finfo(float).eps
+        One triangle with the diagonal, or with ``pairs`` (see
+        :meth:`ProfileState._selected_pairs`) the diagonal and the cells of
+        these pairs only; the other triangle is mirrored.
+        """
+        if pairs is None:
+            return [(i, j) for i in range(len(columns)) for j in range(i, len(columns))]
+        positions = {column: i for i, column in enumerate(columns)}
+        return [(i, i) for i in range(len(columns))] + sorted(
+            tuple(sorted((positions[column_one], positions[column_two]))) for column_one, column_two in pairs)
 
-            for xy in xy_counter.keys():
-                p_xy = xy_counter[xy] / total_occurrences
-                p_y = y_counter[xy[1]] / total_occurrences
-                p_x_given_y = p_xy / (p_y + epsilon)
-                entropy += p_xy * math.log(p_x_given_y, 2)
+    def _cramers_v_matrix(tables, pairs=None):
+        """
+        Calculate corrected Cramers V for all pairs of columns from the Burt matrix.
 
-            return -entropy
+        Gives the same values as :meth:`_cramers_corrected_stat` run on every
+        pair's crosstab (including Yates' correction of 2x2 tables done by
+        ``ss.chi2_contingency``), but with a handful of vectorized operations.
+        With ``pairs`` only these pairs (and the diagonal) are computed from
+        their tables, other cells are NaN.
+        """
+        if pairs is not None:
+            columns = tables.columns
+            result = np.full((len(columns), len(columns)), np.nan)
+            for i, j in pandas_cat._matrix_cells(columns, pairs):
+                result[i, j] = result[j, i] = pandas_cat._cramers_from_table(tables.table(columns[i], columns[j]))
+            return pd.DataFrame(result, index=columns, columns=columns)
+        burt, offsets = tables.burt()
+        p = len(tables.columns)
+        burt = burt.astype(float)
+        # group membership of each category (one-hot column -> original column)
+        groups = np.repeat(np.arange(p), np.diff(offsets))
+        membership = np.zeros((len(groups), p))
+        membership[np.arange(len(groups)), groups] = 1
+        # row_margins[i, b] ... count of category i among records where column b is not missing
+        row_margins = burt @ membership
+        n = membership.T @ row_margins
+        # number of non-empty rows (r) and columns (k) of each pair's crosstab
+        r = membership.T @ (row_margins > 0)
+        k = r.T
+
+        rows_full = row_margins[:, groups]
+        n_full = n[groups][:, groups]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = np.where(n_full > 0, rows_full * rows_full.T / n_full, 0)
+        observed = burt
+        yates = ((r - 1) * (k - 1) == 1)[groups][:, groups]
+        if yates.any():
+            diff = expected - observed
+            observed = np.where(yates, observed + np.sign(diff) * np.minimum(0.5, np.abs(diff)), observed)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(expected > 0, (observed - expected) ** 2 / expected, 0)
+        chi2 = membership.T @ terms @ membership
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            phi2 = chi2 / n
+            phi2corr = np.maximum(0, phi2 - ((k - 1) * (r - 1)) / (n - 1))
+            rcorr = r - ((r - 1) ** 2) / (n - 1)
+            kcorr = k - ((k - 1) ** 2) / (n - 1)
+            denominator = np.minimum(kcorr - 1, rcorr - 1)
+            result = np.where((n > 1) & (denominator > 0), np.sqrt(phi2corr / denominator), 0)
+
+        return pd.DataFrame(result, index=tables.columns, columns=tables.columns)
+
+    def _theils_u(x, y, dropna: bool = True):
+        """
+        Calculate Theil's U statistic for categorical-categorical association.
 
-        H_xy = conditional_entropy(x, y)
-        x_counter = Counter(x)
-        total_occurrences = sum(x_counter.values())
-        p_x = list(map(lambda count: count /
-                   total_occurrences, x_counter.values()))
-        H_x = ss.entropy(p_x, base=2)
+        :param x: first variable (pandas Series)
+        :param y: second variable (pandas Series)
+        :param dropna: if True, records with a missing value in either variable are
+            skipped (same as in crosstabs), otherwise missing values form their own category
 
-        return (H_x - H_xy) / H_x if H_x != 0 else 0
+        :returns: tuple ``(U(x|y), U(y|x))``
+        """
+        tables = _ContingencyTables(pd.DataFrame({0: x.to_numpy(), 1: y.to_numpy()}))
+        return pandas_cat._theils_u_from_table(tables.table(0, 1, dropna=dropna))
 
-    def _plot_histogram(df, column, sort=False, save=False, save_folder=None, rotate=True):
-        label_format = '{:,.0f}'
-        data = df
-        if sort:
-            data = data.sort_values(by=column)
-        grp = data.groupby(column, dropna=False)[column].count()
+    def _theils_u_from_table(confusion_matrix):
+        """
+        Calculate Theil's U statistic in both directions from contingency table.
+
+        :param confusion_matrix: counts with x in rows and y in columns
+
+        :returns: tuple ``(U(x|y), U(y|x))``
+        """
+        counts = np.asarray(confusion_matrix, dtype=float)
+        n = counts.sum()
+        if n == 0:
+            return 0, 0
+
+        def entropy(p):
+            p = p[p > 0] / n
+            return -np.sum(p * np.log2(p))
+
+        H_x = entropy(counts.sum(axis=1))
+        H_y = entropy(counts.sum(axis=0))
+        # mutual information I(x;y) = H(x) + H(y) - H(x,y) = H(x) - H(x|y) = H(y) - H(y|x)
+        mutual = max(0.0, H_x + H_y - entropy(counts.ravel()))
+
+        return (mutual / H_x if H_x != 0 else 0,
+                mutual / H_y if H_y != 0 else 0)
+
+    def _theils_u_matrix(tables, dropna: bool = True, checkpoint=None, pairs=None):
+        """
+        Calculate Theil's U for all pairs of columns, U(row|column).
+
+        Both directions come from the same contingency table, so each
+        unordered pair of columns is processed only once.  ``checkpoint`` is
+        called after each pair.  With ``pairs`` only these pairs (and the
+        diagonal) are computed, other cells are NaN.
+        """
+        columns = tables.columns
+        result = np.zeros((len(columns), len(columns))) if pairs is None else np.full((len(columns),) * 2, np.nan)
+        for i, j in pandas_cat._matrix_cells(columns, pairs):
+            result[i, j], result[j, i] = pandas_cat._theils_u_from_table(
+                tables.table(columns[i], columns[j], dropna=dropna))
+            if checkpoint is not None:
+                checkpoint()
+
+        return pd.DataFrame(result, index=columns, columns=columns)
 
-        x_labels = [str(v) for v in grp.index]
+    def _spearman_from_table(confusion_matrix):
+        """
+        Calculate Spearman rank correlation of category codes from contingency table.
+
+        Equal codes get their average rank, so the result is the same as
+        ``ss.spearmanr`` run on the code arrays.
+        """
+        counts = np.asarray(confusion_matrix, dtype=float)
+        n = counts.sum()
+        if n < 2:
+            return 0.0
+        row = counts.sum(axis=1)
+        col = counts.sum(axis=0)
+        # average ranks of tied codes, centered around the mean rank
+        rank_x = np.cumsum(row) - (row - 1) / 2 - (n + 1) / 2
+        rank_y = np.cumsum(col) - (col - 1) / 2 - (n + 1) / 2
+        var_x = np.sum(row * rank_x ** 2)
+        var_y = np.sum(col * rank_y ** 2)
+        if var_x == 0 or var_y == 0:
+            return 0.0
+        return rank_x @ counts @ rank_y / np.sqrt(var_x * var_y)
+
+    def _spearman_matrix(tables, checkpoint=None, pairs=None):
+        """
+        Calculate Spearman rank correlation of category codes for all pairs of columns.
+
+        The matrix is symmetric, one triangle is computed and mirrored.
+        ``checkpoint`` is called after each pair.  With ``pairs`` only these
+        pairs (and the diagonal) are computed, other cells are NaN.
+        """
+        columns = tables.columns
+        result = np.zeros((len(columns), len(columns))) if pairs is None else np.full((len(columns),) * 2, np.nan)
+        for i, j in pandas_cat._matrix_cells(columns, pairs):
+            result[i, j] = result[j, i] = pandas_cat._spearman_from_table(tables.table(columns[i], columns[j]))
+            if checkpoint is not None:
+                checkpoint()
+
+        return pd.DataFrame(result, index=columns, columns=columns)
+
+    def _cramers_from_table(confusion_matrix):
+        """
+        Calculate corrected Cramers V from a contingency table which may have empty rows and columns.
+
+        Same as :meth:`_cramers_corrected_stat` (including Yates' correction of
+        2x2 tables), with the chi-squared statistic computed directly, so it is
+        cheap enough to be called for every bootstrap resample.
+        """
+        counts = np.asarray(confusion_matrix, dtype=float)
+        counts = counts[counts.sum(axis=1) > 0][:, counts.sum(axis=0) > 0]
+        n = counts.sum()
+        r, k = counts.shape
+        if min(r, k) < 2 or n < 2:
+            return 0.0
+        expected = np.outer(counts.sum(axis=1), counts.sum(axis=0)) / n
+        observed = counts
+        if r == 2 and k == 2:
+            diff = expected - observed
+            observed = observed + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+        chi2 = np.sum((observed - expected) ** 2 / expected)
+        phi2corr = max(0, chi2 / n - ((k - 1) * (r - 1)) / (n - 1))
+        rcorr = r - ((r - 1) ** 2) / (n - 1)
+        kcorr = k - ((k - 1) ** 2) / (n - 1)
+        denominator = min((kcorr - 1), (rcorr - 1))
+        if denominator <= 0:
+            return 0.0
+        return float(np.sqrt(phi2corr / denominator))
+
+    def _association_intervals(tables, seed=0, theils_u_dropna: bool = True, checkpoint=None, pairs=None):
+        """
+        Return bootstrap intervals of association metrics of all pairs of columns of a sample.
+
+        Each unordered pair is resampled once, Cramer's V, Spearman rank and
+        Theil's U in both directions are computed from the same resampled tables.
+        ``checkpoint`` is called after each pair.  With ``pairs`` only these
+        pairs are resampled.
+
+        :returns: ``(column_one, column_two)`` -> metric name -> ``(lower, upper)``,
+            for both orders of each pair, Theil's U is U(column_one|column_two)
+        """
+        def statistics(table):
+            theils = pandas_cat._theils_u_from_table(table[:-1, :-1] if theils_u_dropna else table)
+            return (pandas_cat._cramers_from_table(table[:-1, :-1]),
+                    pandas_cat._spearman_from_table(table[:-1, :-1]), *theils)
+
+        intervals = {}
+        columns = tables.columns
+        for i, j in pandas_cat._matrix_cells(columns, pairs):
+            if i == j:
+                continue
+            column_one, column_two = columns[i], columns[j]
+            lower, upper = pandas_cat._bootstrap_interval(
+                tables.table(column_one, column_two, dropna=False), statistics, seed=seed)
+            bounds = [(float(low), float(high)) for low, high in zip(lower, upper)]
+            intervals[(column_one, column_two)] = {
+                'Cramers V': bounds[0], 'Spearman Rank': bounds[1], 'Theils U': bounds[2]}
+            intervals[(column_two, column_one)] = {
+                'Cramers V': bounds[0], 'Spearman Rank': bounds[1], 'Theils U': bounds[3]}
+            if checkpoint is not None:
+                checkpoint()
+        return intervals
+
+    def _wilson_interval(counts, n, population, z=1.959964):
+        """
+        Return lower and upper bounds (in percent) of 95% Wilson score intervals of proportions in a sample.
+
+        :param counts: counts in the sample, a number or an array
+        :param n: size of the sample
+        :param population: number of records the sample was drawn from without
+            replacement; the finite population correction narrows the intervals
+            as the sample grows to the whole dataset
+        """
+        p = np.asarray(counts, dtype=float) / max(n, 1)
+        # effective sample size, the variance of sampling without replacement is smaller by (N - n) / (N - 1)
+        n = max(n, 1) * max(population - 1, 1) / max(population - n, 1)
+        denominator = 1 + z ** 2 / n
+        center = (p + z ** 2 / (2 * n)) / denominator
+        half_width = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+        return np.clip(center - half_width, 0, 1) * 100, np.clip(center + half_width, 0, 1) * 100
+
+    def _bootstrap_interval(confusion_matrix, statistic, n_resamples=100, seed=0):
+        """
+        Return 95% percentile bootstrap interval of a statistic of a contingency table.
+
+        Tables are drawn from the multinomial distribution of the observed
+        cells, which is the same as resampling the records, so the interval
+        costs ``n_resamples`` evaluations of the statistic on a small table
+        regardless of the number of records.
+
+        :param confusion_matrix: counts of a pair of columns
+        :param statistic: function of a table returning a number or an array of numbers
+        :returns: lower and upper bounds, arrays if the statistic returns arrays
+        """
+        counts = np.asarray(confusion_matrix, dtype=np.int64)
+        n = int(counts.sum())
+        if n == 0:
+            value = np.asarray(statistic(counts), dtype=float)
+            return value, value
+        rng = np.random.default_rng(seed)
+        resamples = rng.multinomial(n, counts.ravel() / n, size=n_resamples).reshape((n_resamples,) + counts.shape)
+        values = np.array([statistic(resample) for resample in resamples], dtype=float)
+        lower, upper = np.percentile(values, [2.5, 97.5], axis=0)
+        return lower, upper
+
+    def _histogram_chart(labels, counts, rotate=True):
+        """Return description of a histogram chart holding only the category labels and counts."""
+        return {'kind': 'histogram', 'labels': labels, 'counts': counts, 'rotate': rotate}
+
+    def _chart_data(chart):
+        """Return JSON serializable data of a chart description, drawn in the browser by client_charts.js."""
+        if chart['kind'] == 'heatmap':
+            table = chart['table']
+            decimals = 2 if chart['fmt'] == '.2f' else None
+            values = table.to_numpy()
+            if decimals:
+                # pairs not selected by the target and pairs options are empty cells
+                values = [[None if np.isnan(value) else value for value in row]
+                          for row in np.round(values.astype(float), 3).tolist()]
+            else:
+                values = values.astype(int).tolist()
+            return {'kind': 'heatmap', 'rows': [str(v) for v in table.index], 'columns': [str(v) for v in table.columns],
+                    'values': values, 'decimals': decimals}
+        return {'kind': 'bars', 'labels': chart['labels'], 'values': [int(v) for v in chart['counts']]}
+
+    def _heatmap_chart(table, fmt='g', linewidth=0):
+        """Return description of an annotated heatmap chart of a (small) table."""
+        return {'kind': 'heatmap', 'table': table, 'fmt': fmt, 'linewidth': linewidth}
+
+    def _draw_chart(chart):
+        """Draw a chart description into a new pyplot figure."""
+        import matplotlib.pyplot as plt
+        import matplotlib.ticker as mticker
+        import seaborn as sns
+
+        if chart['kind'] == 'memory':
+            # one stacked bar, the legend lists attributes from the top
+            table = pd.DataFrame([["", *chart['values']]], columns=["Memory usage", *chart['labels']])
+            table.plot(x='Memory usage', kind='bar', stacked=True, title='Memory usage by attribute')
+            handles, labels = plt.gca().get_legend_handles_labels()
+            order = list(reversed(range(len(chart['labels']))))
+            plt.legend([handles[i] for i in order], [labels[i] for i in order],
+                       bbox_to_anchor=(1, 1), loc=2, borderaxespad=0.)
+            plt.tight_layout()
+            plt.ylabel('Size in ' + chart['unit'])
+            return
         plt.figure(figsize=(16, 4))
-        a = sns.barplot(x=x_labels, y=grp.values,
+        if chart['kind'] == 'heatmap':
+            sns.heatmap(chart['table'], annot=True, cmap='Blues', fmt=chart['fmt'], linewidth=chart['linewidth'])
+            return
+        label_format = '{:,.0f}'
+        x_labels = chart['labels']
+        a = sns.barplot(x=x_labels, y=chart['counts'],
                         order=x_labels,
                         color="lightsteelblue", edgecolor="black")
-        if rotate:
+        if chart['rotate']:
             plt.xticks(rotation=90)
 
         ticks_loc = a.get_yticks().tolist()
         a.yaxis.set_major_locator(mticker.FixedLocator(ticks_loc))
         a.set_yticklabels([label_format.format(x) for x in ticks_loc])
         plt.tight_layout()
+
+    def _savefig_base64():
+        """Save current pyplot figure as base64 encoded SVG and close it.
+
+        Element ids are salted with a fixed string and the date is left out,
+        so the same chart always gives the same bytes.
+        """
+        import matplotlib.pyplot as plt
+
+        tmpfile = BytesIO()
+        with plt.rc_context({'svg.hashsalt': 'pandas-cat'}):
+            plt.savefig(tmpfile, format='svg', metadata={'Date': None})
+        plt.close()
+        return base64.b64encode(tmpfile.getvalue()).decode('utf-8')
+
+    def _render_chart(chart):
+        """Render a chart description by matplotlib to base64 encoded SVG.  Also runs in worker processes."""
+        pandas_cat._draw_chart(chart)
+        return pandas_cat._savefig_base64()
+
+    def _svg_number(value, decimals=None):
+        """Format a value shown in a native chart like client_charts.js does."""
+        if decimals is None:
+            return f'{value:,.0f}'
+        return f'{value:.{decimals}f}'
+
+    def _svg_blue(ratio):
+        """Return colour of the Blues colormap, interpolated between light and dark blue."""
+        light, dark = (247, 251, 255), (8, 48, 107)
+        return 'rgb({},{},{})'.format(*(round(c + (d - c) * ratio) for c, d in zip(light, dark)))
+
+    def _svg_document(width, height, elements):
+        """Return base64 encoded SVG document of the elements."""
+        svg = (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" '
+               f'height="{height}" font-family="sans-serif" font-size="12">' + ''.join(elements) + '</svg>')
+        return base64.b64encode(svg.encode('utf-8')).decode('utf-8')
+
+    def _svg_labels(labels, x, y, step, elements, rotate=False):
+        """
+        Append labels centered at ``x`` with spacing ``step``, rotated when asked or when they would overlap.
+
+        :returns: height taken by the labels
+        """
+        longest = max((len(label) for label in labels), default=0)
+        if not rotate and longest * 7 <= step:
+            for i, label in enumerate(labels):
+                elements.append(f'<text x="{x + (i + 0.5) * step:.2f}" y="{y + 14}" '
+                                f'text-anchor="middle">{html.escape(label)}</text>')
+            return 20
+        for i, label in enumerate(labels):
+            center = x + (i + 0.5) * step + 4
+            elements.append(f'<text x="{center:.2f}" y="{y + 6}" transform="rotate(-90 {center:.2f} {y + 6})" '
+                            f'text-anchor="end">{html.escape(label)}</text>')
+        return min(longest, 40) * 7 + 12
+
+    def _svg_bars(labels, values, decimals=None, ylabel=None, rotate=False):
+        """Return base64 encoded SVG bar chart, the layout of client_charts.js."""
+        width, height, top, right, left = 1000, 200, 10, 10, 70
+        labels = [str(label) for label in labels]
+        step = (width - left - right) / max(1, len(labels))
+        # round ticks of 1, 2 or 5 times a power of ten, at most five of them
+        largest = max(values, default=0) or 1
+        magnitude = 10.0 ** np.floor(np.log10(largest / 4))
+        # ticks are not finer than the shown decimals
+        magnitude = max(magnitude, 10.0 ** -(decimals or 0))
+        tick = next(m * magnitude for m in (1, 2, 5, 10) if 4 * m * magnitude >= largest)
+        ticks = int(np.ceil(largest / tick - 1e-9))
+        maximum = ticks * tick
+        elements = []
+        for k in range(ticks + 1):
+            y = top + height * (1 - k / ticks)
+            elements.append(f'<line x1="{left}" x2="{width - right}" y1="{y:.2f}" y2="{y:.2f}" stroke="#e9ecef"/>')
+            elements.append(f'<text x="{left - 6}" y="{y + 4:.2f}" text-anchor="end">'
+                            f'{pandas_cat._svg_number(k * tick, decimals)}</text>')
+        for i, (label, value) in enumerate(zip(labels, values)):
+            bar_height = value / maximum * height
+            elements.append(f'<rect x="{left + (i + 0.1) * step:.2f}" y="{top + height - bar_height:.2f}" '
+                            f'width="{step * 0.8:.2f}" height="{bar_height:.2f}" fill="lightsteelblue" '
+                            f'stroke="black"><title>{html.escape(label)}: '
+                            f'{pandas_cat._svg_number(value, decimals)}</title></rect>')
+        bottom = pandas_cat._svg_labels(labels, left, top + height, step, elements, rotate=rotate)
+        if ylabel:
+            middle = top + height / 2
+            elements.append(f'<text x="14" y="{middle}" transform="rotate(-90 14 {middle})" '
+                            f'text-anchor="middle">{html.escape(ylabel)}</text>')
+        return pandas_cat._svg_document(width, top + height + bottom + 10, elements)
+
+    def _svg_heatmap(table, fmt='g', linewidth=0):
+        """Return base64 encoded SVG annotated heatmap of a table, the layout of client_charts.js."""
+        width, top, right, cell_height = 1000, 10, 10, 28
+        rows = [str(v) for v in table.index]
+        columns = [str(v) for v in table.columns]
+        decimals = 2 if fmt == '.2f' else None
+        values = table.to_numpy().astype(float)
+        # names of the columns of a crosstab are shown along the axes
+        left = min(300, 7 * max((len(row) for row in rows), default=0) + 12) + 24
+        cell_width = (width - left - right) / max(1, len(columns))
+        # pairs not selected by the target and pairs options are NaN, left empty
+        present = values[~np.isnan(values)]
+        minimum, maximum = (present.min(), present.max()) if present.size else (0, 0)
+        texts = [['' if np.isnan(value) else pandas_cat._svg_number(value, decimals) for value in row]
+                 for row in values]
+        longest = max((len(text) for row in texts for text in row), default=0)
+        font_size = min(12, int(cell_width / max(1, 0.65 * longest)))
+        stroke = ' stroke="white"' + (f' stroke-width="{linewidth}"' if linewidth else '')
+        elements = []
+        for i, row in enumerate(rows):
+            y = top + i * cell_height
+            elements.append(f'<text x="{left - 6}" y="{y + cell_height / 2 + 4}" '
+                            f'text-anchor="end">{html.escape(row)}</text>')
+            for j in range(len(columns)):
+                if np.isnan(values[i, j]):
+                    continue
+                ratio = (values[i, j] - minimum) / (maximum - minimum) if maximum > minimum else 0
+                x = left + j * cell_width
+                elements.append(f'<rect x="{x:.2f}" y="{y}" width="{cell_width:.2f}" height="{cell_height}" '
+                                f'fill="{pandas_cat._svg_blue(ratio)}"{stroke}/>')
+                elements.append(f'<text x="{x + cell_width / 2:.2f}" y="{y + cell_height / 2 + 4}" '
+                                f'text-anchor="middle" font-size="{font_size}" '
+                                f'fill="{"white" if ratio > 0.5 else "black"}">{texts[i][j]}</text>')
+        y = top + len(rows) * cell_height
+        y += pandas_cat._svg_labels(columns, left, y, cell_width, elements)
+        if table.columns.name is not None:
+            y += 16
+            elements.append(f'<text x="{left + (width - left - right) / 2:.2f}" y="{y}" '
+                            f'text-anchor="middle">{html.escape(str(table.columns.name))}</text>')
+        if table.index.name is not None:
+            middle = top + len(rows) * cell_height / 2
+            elements.append(f'<text x="14" y="{middle}" transform="rotate(-90 14 {middle})" '
+                            f'text-anchor="middle">{html.escape(str(table.index.name))}</text>')
+        return pandas_cat._svg_document(width, y + 10, elements)
+
+    def _render_chart_svg(chart):
+        """Render a chart description to base64 encoded SVG directly from its counts, without matplotlib."""
+        if chart['kind'] == 'heatmap':
+            return pandas_cat._svg_heatmap(chart['table'], chart['fmt'], chart['linewidth'])
+        if chart['kind'] == 'memory':
+            return pandas_cat._svg_bars(chart['labels'], chart['values'], decimals=2,
+                                        ylabel='Size in ' + chart['unit'])
+        return pandas_cat._svg_bars(chart['labels'], [int(v) for v in chart['counts']], rotate=chart['rotate'])
+
+    def _chart_backend(backend):
+        """Return function rendering a chart description to base64 encoded SVG for the ``chart_backend`` option."""
+        if callable(backend):
+            return backend
+        backends = {'svg': pandas_cat._render_chart_svg, 'matplotlib': pandas_cat._render_chart}
+        if backend not in backends:
+            raise ValueError(f"Unsupported chart backend {backend!r}, use one of {list(backends)} or a function.")
+        return backends[backend]
+
+    def _render_chart_timed(chart, render):
+        """Render a chart description, return the SVG and seconds spent.  Also runs in worker processes."""
+        start = time.perf_counter()
+        content = render(chart)
+        return content, time.perf_counter() - start
+
+    def _render_charts(charts, n_jobs=1, cache=None, durations: list = None, checkpoint=None, backend='svg'):
+        """
+        Render list of chart descriptions to base64 encoded SVGs.
+
+        :param charts: chart descriptions (see :meth:`_histogram_chart` and :meth:`_heatmap_chart`)
+        :param n_jobs: number of worker processes, ``-1`` for all CPUs, ``1`` renders serially
+        :param cache: optional :class:`_ChartCache`; only charts missing in it are rendered
+        :param durations: optional list, filled with seconds spent rendering each chart
+            (``0`` for charts read from the cache)
+        :param checkpoint: optional callable, called after each chart rendered serially
+        :param backend: ``'svg'``, ``'matplotlib'`` or a function of a chart description
+            returning base64 encoded SVG (see the ``chart_backend`` option of :meth:`profile`)
+
+        :returns: list of SVGs in the same order as ``charts``
+        """
+        render = pandas_cat._chart_backend(backend)
+        result = [None] * len(charts)
+        if cache is not None:
+            result = [cache.get(chart) for chart in charts]
+        todo = [i for i, content in enumerate(result) if content is None]
+        to_render = [charts[i] for i in todo]
+
+        if n_jobs is None or n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs <= 1 or len(to_render) <= 1:
+            rendered = []
+            # worker processes have their own pyplot, only threads of this process share it
+            lock = _pyplot_lock if render is pandas_cat._render_chart else nullcontext()
+            for chart in to_render:
+                with lock:
+                    rendered.append(pandas_cat._render_chart_timed(chart, render))
+                if checkpoint is not None:
+                    checkpoint()
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                rendered = list(executor.map(pandas_cat._render_chart_timed, to_render, itertools.repeat(render),
+                                             chunksize=max(1, len(to_render) // (4 * n_jobs))))
+
+        if durations is not None:
+            durations[:] = [0.0] * len(charts)
+        for i, (content, seconds) in zip(todo, rendered):
+            result[i] = content
+            if durations is not None:
+                durations[i] = seconds
+            if cache is not None:
+                cache.put(charts[i], content)
+        if cache is not None:
+            cache.evict()
+        return result
+
+    def _plot_histogram(df, column, sort=False, save=False, save_folder=None, rotate=True):
+        data = df
+        if sort:
+            data = data.sort_values(by=column)
+        grp = data.groupby(column, dropna=False)[column].count()
+        chart = pandas_cat._histogram_chart([str(v) for v in grp.index], grp.values, rotate=rotate)
         if save:
+            import matplotlib.pyplot as plt
+
+            pandas_cat._draw_chart(chart)
             filename = ""
             if save_folder is not None:
                 filename = save_folder+'\\'
             filename = filename+column+'.svg'
             plt.savefig(filename)
+            plt.close()
         else:
-            tmpfile = BytesIO()
-            plt.savefig(tmpfile, format='svg')
-            encoded = base64.b64encode(tmpfile.getvalue()).decode('utf-8')
-            fcont = encoded
-            return fcont
+            return pandas_cat._render_chart(chart)
 
     def _humanbytes(B):
         """Return the given bytes as a human friendly KB, MB, GB, or TB string."""
@@ -661,7 +3055,8 @@ class pandas_cat:
             are two engines supported - internal one and CleverMiner.
             Use ``'CLM'`` for CleverMiner and any other value for internal.
         :param opts: If CLM engine is used, these options are passed
-            to CleverMiner as is.
+            to CleverMiner as is.  Option ``verbose`` sets messages shown,
+            see :meth:`profile`.
 
         :returns: A new DataFrame with eligible columns converted to ordered
             ``pandas.CategoricalDtype``.  The input DataFrame is not modified.
@@ -673,6 +3068,10 @@ class pandas_cat:
             CleverMiner >= 1.0.7 is required for CLM engine conversion.  If
             an older version is  installed the original DataFrame is returned unchanged.
         """
+        with _verbosity((opts or {}).get('verbose', True)):
+            return pandas_cat._prepare(df, auto_data_prep, opts)
+
+    def _prepare(df, auto_data_prep, opts):
         #currently we are moving CleverMiner's data preparation to here, internal processing keeping as default
         #CleverMiner's data preparation is kept for compatibility
         
@@ -681,111 +3080,199 @@ class pandas_cat:
         #prevent changing original df
         opts2['keep_df'] = True
         if auto_data_prep=='CLM':
-            print("INFO: Using CleverMiner to prepare dataset")
+            logger.info("INFO: Using CleverMiner to prepare dataset")
+            from cleverminer import cleverminer
+
             clm = cleverminer(df=my_df, opts=opts2)
             clm.print_data_definition()
             if cleverminer.version_string < '1.0.7':
                 return my_df
             return clm.df
         else:
-            print("INFO: Using INTERNAL AUTO PREPARATION")
+            logger.info("INFO: Using INTERNAL AUTO PREPARATION")
             pandas_cat._automatic_data_conversions(df)
             for col in df.select_dtypes(exclude=['category']).columns:
-                df[col] = df[col].apply(str)
+                df[col] = pandas_cat._map_uniques(df[col], lambda values: values.apply(str))
             try:
                 unique_counts = pd.DataFrame.from_records([(col, df[col].nunique()) for col in df.columns],
                                                           columns=['Column_Name', 'Num_Unique']).sort_values(
                     by=['Num_Unique'])
             except:
-                print(
+                logger.error(
                     "Error in input data, probably unsupported data type. Will try to scan for column with unsupported type.")
                 colname = ""
                 try:
                     for col in df.columns:
                         colname = col
-                        print(f"...column {col} has {int(df[col].nunique())} values")
+                        logger.info(f"...column {col} has {int(df[col].nunique())} values")
                 except:
-                    print(f"... detected : column {colname} has unsupported type: {type(df[col])}.")
+                    logger.error(f"... detected : column {colname} has unsupported type: {type(df[col])}.")
                     exit(1)
-                print(
+                logger.error(
                     f"Error in data profiling - attribute with unsupported type not detected. Please profile attributes manually, only simple attributes are supported.")
                 exit(1)
                           
-            s = ""                          
-            for column in df:
-                s = f"Column {column}:"
-                dfc = pd.get_dummies(df[column])
-                for col2 in dfc:
-                    s += f"{col2} "
-                print(s)
+            if logger.isEnabledFor(logging.DEBUG):
+                for column in df:
+                    if isinstance(df[column].dtype, pd.CategoricalDtype):
+                        categories = df[column].cat.categories
+                    else:
+                        categories = sorted(df[column].dropna().unique(), key=str)
+                    logger.debug(f"Column {column}:" + "".join(f"{category} " for category in categories))
 
             return df
 
 
     def _automatic_data_conversions(df):
-        print("Automatically reordering numeric categories ...")
-        verbosity = False
-        for i in range(len(df.columns)):
-            if verbosity:
-                print(f"#{i}: {df.columns[i]} : {df.dtypes.iloc[i]}.")
-            try:
-                df[df.columns[i]] = df[df.columns[i]].astype(str).astype(float)
-                if verbosity:
-                    print(f"CONVERTED TO FLOATS #{i}: {df.columns[i]} : {df.dtypes.iloc[i]}.")
-                lst2 = pd.unique(df[df.columns[i]])
-                is_int = True
-                for val in lst2:
-                    if val % 1 != 0:
-                        is_int = False
-                if is_int:
-                    df[df.columns[i]] = df[df.columns[i]].astype(int)
-                    if verbosity:
-                        print(f"CONVERTED TO INT #{i}: {df.columns[i]} : {df.dtypes.iloc[i]}.")
-                lst3 = pd.unique(df[df.columns[i]])
-                cat_type = CategoricalDtype(categories=sorted(lst3), ordered=True)
-                df[df.columns[i]] = df[df.columns[i]].astype(cat_type)
-                if verbosity:
-                    print(f"CONVERTED TO CATEGORY #{i}: {df.columns[i]} : {df.dtypes.iloc[i]}.")
+        logger.info("Automatically reordering numeric categories ...")
+        for column in df.columns:
+            df[column] = pandas_cat._map_uniques(df[column], pandas_cat._convert_column)
+        logger.info("Automatically reordering numeric categories ...done")
+
+    def _convert_column(values):
+        """
+        Convert values of a column to ordered categories if they are numbers or contain numbers.
 
+        Called with one row per distinct value (see :meth:`_map_uniques`), so the
+        order of ``values`` is the order of the first occurrence in the column.
+        """
+        try:
+            values = values.astype(str).astype(float)
+            logger.debug(f"CONVERTED TO FLOATS {values.name}")
+            is_int = True
+            for val in pd.unique(values):
+                if val % 1 != 0:
+                    is_int = False
+            if is_int:
+                values = values.astype(int)
+                logger.debug(f"CONVERTED TO INT {values.name}")
+            cat_type = CategoricalDtype(categories=sorted(pd.unique(values)), ordered=True)
+            values = values.astype(cat_type)
+            logger.debug(f"CONVERTED TO CATEGORY {values.name}")
+
+        except:
+            logger.debug("...cannot be converted to int")
+            try:
+                is_ok = True
+                valid_pairs = []
+                for val in values.unique():
+                    if pd.isna(val) or str(val).lower() in ('nan', 'na', 'none', ''):
+                        continue
+                    res = re.findall(r"-?\d+", str(val))
+                    if len(res) > 0:
+                        valid_pairs.append((int(res[0]), val))
+                    else:
+                        is_ok = False
+                if is_ok and valid_pairs:
+                    sorted_list = [v for _, v in sorted(valid_pairs, key=lambda x: x[0])]
+                    cat_type = CategoricalDtype(categories=sorted_list, ordered=True)
+                    values = values.astype(cat_type)
             except:
-                if verbosity:
-                    print("...cannot be converted to int")
-                try:
-                    values = df[df.columns[i]].unique()
-                    if verbosity:
-                        print(f"Values: {values}")
-                    is_ok = True
-                    valid_pairs = []
-                    for val in values:
-                        if pd.isna(val) or str(val).lower() in ('nan', 'na', 'none', ''):
-                            continue
-                        res = re.findall(r"-?\d+", str(val))
-                        if len(res) > 0:
-                            valid_pairs.append((int(res[0]), val))
-                            #extracted.append(int(res[0]))
-                        else:
-                            is_ok = False
-                    if is_ok and valid_pairs:
-                        sorted_list = [v for _, v in sorted(valid_pairs, key=lambda x: x[0])]
-                        cat_type = CategoricalDtype(categories=sorted_list, ordered=True)
-                        df[df.columns[i]] = df[df.columns[i]].astype(cat_type)
-                except:
-                    if verbosity:
-                        print("...cannot extract numbers from all categories")
+                logger.debug("...cannot extract numbers from all categories")
+        return values
+
+    def _first_occurrences(codes):
+        """Return positions of the first occurrence of each code of ``pd.factorize`` (negative codes skipped)."""
+        # factorize numbers values in order of their first occurrence, so each new value raises the running maximum
+        return np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+
+    def _map_uniques(series, func):
+        """
+        Apply a function to the distinct values of a column and broadcast its result to all rows.
 
-        print("Automatically reordering numeric categories ...done")
+        ``func`` gets a Series with one row per distinct value (and per kind of
+        missing value, e.g. ``None`` and ``NaN``) in order of the first
+        occurrence and returns a Series of the same length.  The result is
+        expanded by one ``take`` over the codes, which for categorical results
+        is a single remap of the codes.
+        """
+        try:
+            codes, uniques = pd.factorize(series)
+        except TypeError:
+            # unhashable values
+            return func(series)
+        if len(codes) == 0:
+            return func(series)
+        positions = pandas_cat._first_occurrences(codes)
+        if len(positions) != len(uniques):
+            _, positions = np.unique(codes[codes >= 0], return_index=True)
+            positions = np.flatnonzero(codes >= 0)[positions]
+        missing_rows = np.flatnonzero(codes < 0)
+        if len(missing_rows):
+            na_values = series.iloc[missing_rows].to_numpy(dtype=object)
+            if len(pd.unique(na_values)) == 1:
+                na_codes = np.zeros(len(missing_rows), dtype=codes.dtype)
+            else:
+                na_codes = pd.factorize(np.array([str(value) for value in na_values]))[0]
+            codes = codes.copy()
+            codes[missing_rows] = len(uniques) + na_codes
+            positions = np.append(positions, missing_rows[pandas_cat._first_occurrences(na_codes)])
+        converted = func(series.iloc[positions].reset_index(drop=True))
+        result = converted.take(codes)
+        result.index = series.index
+        return result
 
             
     @staticmethod
-    def handle_missing_values(df, na_values: list = [], na_ignore: list = [], keep_default_na: bool = True):
+    def handle_missing_values(df, na_values: list = [], na_ignore: list = [], keep_default_na: bool = True,
+                              na_case_insensitive: bool = False, na_patterns: list = None):
         """
         Replaces missing string values with real missing values.
 
+        Tokens are matched against the unique values of each column only and
+        the rows are replaced by remapping the codes, so the run time depends
+        on the number of distinct values rather than on the number of rows.
+
         :param df: pandas dataframe
         :param na_values: array of additional custom values that should be also detected as missing values
         :param na_ignore: array of default values to be removed from the list of missing values
         :param keep_default_na: if True, the default missing values will be retained, otherwise, only custom values will be used
+        :param na_case_insensitive: if True, strings matching missing values in any letter case are also missing values
+        :param na_patterns: array of regular expressions, strings fully matching any of them are also missing values
         """
+        missing_values = pandas_cat._missing_values(na_values, na_ignore, keep_default_na)
+        is_missing = pandas_cat._missing_value_rule(missing_values, na_case_insensitive, na_patterns)
+
+        detected_missing_values = {}
+        replaced_counts = {}
+
+        for column in df.columns:
+            series = df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy()
+                uniques = series.cat.categories
+            else:
+                codes, uniques = pd.factorize(series, sort=False)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            missing = np.fromiter((is_missing(value) for value in uniques), dtype=bool, count=len(uniques))
+
+            # same order as value_counts, unused categories included
+            detected = np.flatnonzero(missing)
+            detected = detected[np.argsort(-counts[detected], kind='stable')]
+            detected_missing_values[column] = [uniques[i] for i in detected]
+            replaced_counts[column] = [int(counts[i]) for i in detected]
+
+            na_already_detected_by_pandas = int(np.count_nonzero(codes < 0))
+            if na_already_detected_by_pandas > 0:
+                detected_missing_values[column].insert(
+                    0, 'pandas.NAN')
+                replaced_counts[column].insert(0, na_already_detected_by_pandas)
+
+            if not missing.any():
+                continue
+            logger.debug(f"...column {column}: missing values {detected_missing_values[column]}")
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.cat.remove_categories(uniques[missing])
+            else:
+                if series.dtype.kind in 'iub':
+                    # integers cannot hold missing values, same as replace() keep them as objects
+                    series = series.astype(object)
+                df[column] = series.mask(np.append(missing, False)[codes], pd.NA)
+
+        return df, detected_missing_values, replaced_counts
+
+    def _missing_values(na_values: list = None, na_ignore: list = None, keep_default_na: bool = True):
+        """Return the list of missing value tokens, see :meth:`handle_missing_values`."""
         default_missing_values = ['-1.#IND', '1.#QNAN', '1.#IND', '-1.#QNAN', '#N/A N/A', '#N/A', 'N/A',
                                   'n/a', 'NA', 'na', '<NA>', '#NA', 'NULL', 'null', 'Null', 'NAN', 'NaN',
                                   '-NaN', 'nan', '-nan', 'NONE', 'None', 'none', 'UNKNOWN', 'Unknown', 'unknown',
@@ -810,31 +3297,59 @@ class pandas_cat:
         if na_values:
             missing_values.extend(na_values)
 
-        detected_missing_values = {}
-        replaced_counts = {}
+        return missing_values
 
-        for column in df.columns:
-            categories_counts = df[column].value_counts()
-            missing_counts = categories_counts[categories_counts.index.isin(
-                missing_values)]
+    def _missing_value_rule(missing_values, case_insensitive=False, patterns=None):
+        """Return function telling whether a value is a missing value token."""
+        tokens = frozenset(missing_values)
+        lowered = frozenset(str(value).lower() for value in missing_values)
+        compiled = [re.compile(pattern) for pattern in patterns or []]
 
-            detected_missing_values[column] = []
-            replaced_counts[column] = []
+        def is_missing(value):
+            if value in tokens:
+                return True
+            if not isinstance(value, str):
+                return False
+            if case_insensitive and value.lower() in lowered:
+                return True
+            return any(pattern.fullmatch(value) for pattern in compiled)
 
-            detected_missing_values[column] = missing_counts.index.tolist()
-            replaced_counts[column] = missing_counts.values.tolist()
+        return is_missing
 
-            na_already_detected_by_pandas = df[column].isna().sum()
-            if na_already_detected_by_pandas > 0:
-                detected_missing_values[column].insert(
-                    0, 'pandas.NAN')
-                replaced_counts[column].insert(0, df[column].isna().sum())
 
-            if hasattr(df[column], 'cat'):
-                to_remove = [v for v in missing_values if v in df[column].cat.categories]
-                if to_remove:
-                    df[column] = df[column].cat.remove_categories(to_remove)
-            else:
-                df[column] = df[column].replace(missing_values, pd.NA)
+def main(argv=None):
+    """
+    Command line interface, profiles files and writes one report per file to ``report/``.
 
-        return df, detected_missing_values, replaced_counts
+    Run as ``python -m pandas_cat data/*.csv --jobs 4``; the exit code is 1
+    if any of the files failed.
+    """
+    parser = argparse.ArgumentParser(prog='pandas-cat', description='Profile categorical datasets to HTML reports.')
+    parser.add_argument('files', nargs='+', help='CSV or Parquet files, one report per file')
+    parser.add_argument('--template', choices=['default', 'interactive'], default='default')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes, -1 for all CPUs')
+    parser.add_argument('--cat-limit', type=int, default=20, help='maximum categories of a profiled column')
+    parser.add_argument('--high-cardinality', choices=['drop', 'other'], default='drop')
+    parser.add_argument('--target', help='compute correlations only of this column with the others')
+    parser.add_argument('--sample', type=float, help='profile a random sample of this many (or this fraction of) records')
+    parser.add_argument('--no-auto-prepare', action='store_true', help='do not order ordinal categories')
+    parser.add_argument('--sep', help='CSV separator')
+    parser.add_argument('--encoding', help='CSV encoding')
+    parser.add_argument('--chunksize', type=int, default=100000, help='rows read at once')
+    parser.add_argument('--quiet', action='store_true', help='show only failures')
+    args = parser.parse_args(argv)
+
+    opts = {'auto_prepare': not args.no_auto_prepare, 'cat_limit': args.cat_limit,
+            'high_cardinality': args.high_cardinality, 'verbose': not args.quiet}
+    if args.target is not None:
+        opts['target'] = args.target
+    if args.sample is not None:
+        opts['sample'] = int(args.sample) if args.sample >= 1 else args.sample
+    read_opts = {name: value for name, value in (('sep', args.sep), ('encoding', args.encoding)) if value is not None}
+    results = pandas_cat.profile_many(args.files, template=None if args.template == 'default' else args.template,
+                                      opts=opts, n_jobs=args.jobs, chunksize=args.chunksize, read_opts=read_opts)
+    return 1 if any(result['error'] is not None for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+// pandas-cat client side charts
+// Draws bar charts and annotated heatmaps as inline SVG from the count tables
+// embedded in the report (see `pcCharts`), so no chart has to be rendered by matplotlib.
+
+(function () {
+  const SVG_NS = 'http://www.w3.org/2000/svg';
+  const WIDTH = 1000;
+  const HEIGHT = 260;
+  const MARGIN = { top: 10, right: 10, bottom: 60, left: 70 };
+
+  const formatNumber = (value, decimals) =>
+    decimals == null
+      ? Number(value).toLocaleString('en-US')
+      : Number(value).toFixed(decimals);
+
+  const element = (name, attributes, text) => {
+    const el = document.createElementNS(SVG_NS, name);
+    Object.entries(attributes).forEach(([key, value]) => el.setAttribute(key, value));
+    if (text !== undefined) el.textContent = text;
+    return el;
+  };
+
+  const newSvg = (height) =>
+    element('svg', {
+      viewBox: `0 0 ${WIDTH} ${height}`,
+      width: '100%',
+      'font-family': 'sans-serif',
+      'font-size': '12',
+    });
+
+  // Blues colormap, interpolated between light and dark blue
+  const blue = (ratio) => {
+    const light = [247, 251, 255];
+    const dark = [8, 48, 107];
+    const rgb = light.map((c, i) => Math.round(c + (dark[i] - c) * ratio));
+    return `rgb(${rgb.join(',')})`;
+  };
+
+  const drawBars = (container, chart) => {
+    const svg = newSvg(HEIGHT);
+    const plotWidth = WIDTH - MARGIN.left - MARGIN.right;
+    const plotHeight = HEIGHT - MARGIN.top - MARGIN.bottom;
+    const max = Math.max(1, ...chart.values);
+    const step = plotWidth / Math.max(1, chart.labels.length);
+
+    [0, 0.25, 0.5, 0.75, 1].forEach((fraction) => {
+      const y = MARGIN.top + plotHeight * (1 - fraction);
+      svg.appendChild(element('line', { x1: MARGIN.left, x2: WIDTH - MARGIN.right, y1: y, y2: y, stroke: '#e9ecef' }));
+      svg.appendChild(
+        element('text', { x: MARGIN.left - 6, y: y + 4, 'text-anchor': 'end' }, formatNumber(max * fraction, chart.decimals))
+      );
+    });
+
+    chart.labels.forEach((label, i) => {
+      const barHeight = (chart.values[i] / max) * plotHeight;
+      const x = MARGIN.left + i * step;
+      const bar = element('rect', {
+        x: x + step * 0.1,
+        y: MARGIN.top + plotHeight - barHeight,
+        width: step * 0.8,
+        height: barHeight,
+        fill: 'lightsteelblue',
+        stroke: 'black',
+      });
+      bar.appendChild(element('title', {}, `${label}: ${formatNumber(chart.values[i], chart.decimals)}`));
+      svg.appendChild(bar);
+      svg.appendChild(
+        element('text', { x: x + step / 2, y: HEIGHT - MARGIN.bottom + 16, 'text-anchor': 'middle' }, label)
+      );
+    });
+    if (chart.ylabel) {
+      svg.appendChild(
+        element('text', { x: 14, y: MARGIN.top + plotHeight / 2, transform: `rotate(-90 14 ${MARGIN.top + plotHeight / 2})`, 'text-anchor': 'middle' }, chart.ylabel)
+      );
+    }
+    container.appendChild(svg);
+  };
+
+  const drawHeatmap = (container, chart) => {
+    const cellHeight = 28;
+    const left = 150;
+    const height = MARGIN.top + cellHeight * chart.rows.length + 40;
+    const svg = newSvg(height);
+    const cellWidth = (WIDTH - left - MARGIN.right) / Math.max(1, chart.columns.length);
+    // pairs not selected by the target and pairs options are null, left empty
+    const values = chart.values.flat().filter((value) => value !== null);
+    const min = Math.min(...values);
+    const max = Math.max(...values);
+
+    chart.rows.forEach((row, i) => {
+      const y = MARGIN.top + i * cellHeight;
+      svg.appendChild(element('text', { x: left - 6, y: y + cellHeight / 2 + 4, 'text-anchor': 'end' }, row));
+      chart.columns.forEach((column, j) => {
+        const value = chart.values[i][j];
+        if (value === null) return;
+        const ratio = max > min ? (value - min) / (max - min) : 0;
+        const x = left + j * cellWidth;
+        svg.appendChild(element('rect', { x, y, width: cellWidth, height: cellHeight, fill: blue(ratio), stroke: 'white' }));
+        svg.appendChild(
+          element(
+            'text',
+            { x: x + cellWidth / 2, y: y + cellHeight / 2 + 4, 'text-anchor': 'middle', fill: ratio > 0.5 ? 'white' : 'black' },
+            formatNumber(value, chart.decimals)
+          )
+        );
+      });
+    });
+    chart.columns.forEach((column, j) => {
+      svg.appendChild(
+        element('text', { x: left + (j + 0.5) * cellWidth, y: height - 20, 'text-anchor': 'middle' }, column)
+      );
+    });
+    container.appendChild(svg);
+  };
+
+  const lookup = (el) => {
+    switch (el.dataset.chart) {
+      case 'memory':
+        return pcCharts.memory;
+      case 'histogram':
+        return pcCharts.histograms[el.dataset.var];
+      case 'overall':
+        return pcCharts.overall;
+      case 'crosstab':
+        return pcCharts.crosstabs[el.dataset.var][el.dataset.var2];
+    }
+  };
+
+  const draw = (el) => {
+    if (el.classList.contains('pc-chart--done')) return;
+    const chart = lookup(el);
+    if (!chart) return;
+    (chart.kind === 'heatmap' ? drawHeatmap : drawBars)(el, chart);
+    el.classList.add('pc-chart--done');
+  };
+
+  window.addEventListener('load', () => {
+    document.querySelectorAll('.pc-chart:not([data-chart="crosstab"])').forEach(draw);
+    // crosstab heatmaps are many, draw each one only when its own accordion item is opened
+    document.addEventListener('shown.bs.collapse', (event) => {
+      event.target
+        .querySelectorAll('.pc-chart[data-chart="crosstab"]')
+        .forEach((el) => el.closest('.collapse') === event.target && draw(el));
+    });
+  });
+})();
@@ -4,7 +4,9 @@
 // GLOBAL VARIABLES
 
 const profiles = JSON.parse(`{{ attribute_profiles | tojson  }}`); // data from python
-const correlations = JSON.parse(`{{ correlations_data | tojson }}`); // data from python
+const correlationsData = JSON.parse(`{{ correlations_data | tojson }}`); // data from python, columnar
+const correlations = {}; // entries of matrices decoded from correlationsData, by matrix name
+let crosstabCounts = null; // counts of crosstabs of all pairs, once decompressed
 let isDragging = false; // attributes scrollbar mouse dragging indicator
 let chartColors = null; // color scheme for Chart.js
 let isPrintView = false; // all at once view indicator
@@ -387,7 +389,9 @@ function sortMiniTable(index, box, chart) {
         `<li class='minitable__row'>
       <div class='minitable__field'>${cat}</div>
       <div class='minitable__field'>${profile.counts[i]}</div>
-      <div class='minitable__field'>${profile.percentages[i]} %
+      <div class='minitable__field'>${profile.percentages[i]} %${
+        profile.intervals ? ` (${profile.intervals[i][0]}–${profile.intervals[i][1]} %)` : ''
+      }
         </div>
         </li>`
     );
@@ -503,6 +507,109 @@ function showToast(message) {
   }, 3000);
 }
 
+// Decompress counts of crosstabs, embedded as base64 of deflated typed array with compress_crosstabs
+async function loadCrosstabs() {
+  const { counts, dtype } = correlationsData.crosstabs;
+  if (typeof counts !== 'string') return counts;
+  const bytes = Uint8Array.from(atob(counts), (c) => c.charCodeAt(0));
+  const stream = new Blob([bytes])
+    .stream()
+    .pipeThrough(new DecompressionStream('deflate'));
+  const buffer = await new Response(stream).arrayBuffer();
+  return dtype === 'uint32' ? new Uint32Array(buffer) : new Float64Array(buffer);
+}
+
+const crosstabsReady = loadCrosstabs().then((counts) => {
+  crosstabCounts = counts;
+});
+
+// Entries {x, y, v} of a matrix, decoded on first use; null until the counts are loaded
+function correlationEntries(name) {
+  if (!(name in correlations)) {
+    const entries = decodeCorrelations(name);
+    if (!entries) return null;
+    correlations[name] = entries;
+  }
+  return correlations[name];
+}
+
+function decodeCorrelations(name) {
+  const { columns, metrics, intervals, crosstabs } = correlationsData;
+  const n = columns.length;
+
+  // Metric of all pairs, row-major matrix; pairs not selected by target and pairs options are null
+  if (name in metrics) {
+    const bounds = intervals && intervals[name];
+    const entries = [];
+    metrics[name].forEach((v, k) => {
+      if (v === null) return;
+      const entry = { x: columns[Math.floor(k / n)], y: columns[k % n], v };
+      if (bounds && bounds[2 * k] !== null) {
+        entry.ci = [bounds[2 * k], bounds[2 * k + 1]];
+      }
+      entries.push(entry);
+    });
+    return entries;
+  }
+
+  // Crosstab of a pair, only pairs (i, j) with i <= j are stored one after another
+  if (!crosstabCounts) return null;
+  const [attributeOne, attributeTwo] = name.split(' x ');
+  const one = columns.indexOf(attributeOne);
+  const two = columns.indexOf(attributeTwo);
+  const [i, j] = one <= two ? [one, two] : [two, one];
+  const sizes = crosstabs.categories.map((categories) => categories.length);
+  let offset = 0;
+  if (crosstabs.pairs) {
+    // only the selected pairs are stored, listed as flat [i, j, ...]
+    let found = false;
+    for (let k = 0; k < crosstabs.pairs.length && !found; k += 2) {
+      const [a, b] = [crosstabs.pairs[k], crosstabs.pairs[k + 1]];
+      found = a === i && b === j;
+      if (!found) offset += sizes[a] * sizes[b];
+    }
+    if (!found) return [];
+  } else {
+    for (let a = 0; a < i; a++) {
+      for (let b = a; b < n; b++) offset += sizes[a] * sizes[b];
+    }
+    for (let b = i; b < j; b++) offset += sizes[i] * sizes[b];
+  }
+  const count =
+    one <= two
+      ? (k, l) => crosstabCounts[offset + k * sizes[j] + l]
+      : (k, l) => crosstabCounts[offset + l * sizes[j] + k];
+
+  // Categories with no record in the pair are left out, same as in pandas crosstab
+  const categoriesOne = crosstabs.categories[one];
+  const categoriesTwo = crosstabs.categories[two];
+  const rowTotals = categoriesOne.map((_, k) =>
+    categoriesTwo.reduce((total, _, l) => total + count(k, l), 0)
+  );
+  const columnTotals = categoriesTwo.map((_, l) =>
+    categoriesOne.reduce((total, _, k) => total + count(k, l), 0)
+  );
+  const entries = [];
+  categoriesOne.forEach((x, k) => {
+    if (!rowTotals[k]) return;
+    categoriesTwo.forEach((y, l) => {
+      if (columnTotals[l]) entries.push({ x, y, v: count(k, l) });
+    });
+  });
+  return entries;
+}
+
+// Whether the crosstab of a pair is in the report, only selected pairs are with target and pairs options
+function hasCrosstab(attributeOne, attributeTwo) {
+  const { columns, crosstabs } = correlationsData;
+  if (!crosstabs.pairs) return true;
+  const [i, j] = [columns.indexOf(attributeOne), columns.indexOf(attributeTwo)].sort((a, b) => a - b);
+  for (let k = 0; k < crosstabs.pairs.length; k += 2) {
+    if (crosstabs.pairs[k] === i && crosstabs.pairs[k + 1] === j) return true;
+  }
+  return false;
+}
+
 // Render correlations matrix
 function renderMatrix(canvas) {
   const chart = Chart.getChart(canvas);
@@ -511,8 +618,13 @@ function renderMatrix(canvas) {
   const styles = getComputedStyle(document.documentElement);
   const chartColorPositive = styles.getPropertyValue('--color-two');
   const chartColorNegative = styles.getPropertyValue('--color-one');
-  const data = correlations[canvas.dataset.correlations];
-  const maxCorrelation = Math.max(...data.map((corr) => corr.v));
+  const data = correlationEntries(canvas.dataset.correlations);
+  if (!data) {
+    // compressed counts are not decoded yet
+    crosstabsReady.then(() => renderMatrix(canvas));
+    return;
+  }
+  const maxCorrelation = Math.max(0, ...data.map((corr) => corr.v));
   const [attributeOne, attributeTwo] = canvas.dataset.correlations.split(' x ');
 
   const labelsX =
@@ -611,7 +723,9 @@ function renderMatrix(canvas) {
           callbacks: {
             label: (context) => {
               const data = context.dataset.data[context.dataIndex];
-              return `${data.x} x ${data.y}: ${data.v}`;
+              return `${data.x} x ${data.y}: ${data.v}${
+                data.ci ? ` (95% CI ${data.ci[0]}–${data.ci[1]})` : ''
+              }`;
             },
             title: () =>
               `${
@@ -926,7 +1040,9 @@ function handleMinitableBtn(index) {
       `<li class='minitable__row'>
     <div class='minitable__field'>${cat}</div>
     <div class='minitable__field'>${profile.counts[i]}</div>
-    <div class='minitable__field'>${profile.percentages[i]} %
+    <div class='minitable__field'>${profile.percentages[i]} %${
+      profile.intervals ? ` (${profile.intervals[i][0]}–${profile.intervals[i][1]} %)` : ''
+    }
       </div>
       </li>`
   );
@@ -1315,7 +1431,10 @@ function handleToggleView() {
     // Render individual correlations charts
     profiles.forEach((profile1) => {
       profiles.forEach((profile2) => {
-        if (profile1.attribute !== profile2.attribute) {
+        if (
+          profile1.attribute !== profile2.attribute &&
+          hasCrosstab(profile1.attribute, profile2.attribute)
+        ) {
           const correlationHtml = `
             <div class="box box--chart">
               <div class="settings">
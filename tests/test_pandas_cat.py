@@ -1,9 +1,15 @@
+import asyncio
+import base64
+import json
+import logging
 import os
+import subprocess
 import sys
 import pandas as pd
 import pytest
 import tkinter
-from pandas_cat import pandas_cat
+import pandas_cat as pandas_cat_module
+from pandas_cat import pandas_cat, ProfileState, ColumnProfile, ProfileResult
 
 
 def make_df():
@@ -43,6 +49,17 @@ def test_prepare_age_category_order():
     )
 
 
+def test_prepare_converts_distinct_values_and_keeps_rows():
+    df = pd.DataFrame({
+        'Number': ['10', '2', None, '2', '10'],
+        'Nominal': pd.Series(['b', None, 'a', float('nan'), 'b'], dtype=object),
+    })
+    result = pandas_cat.prepare(df)
+    assert list(result['Number'].cat.categories) == [2, 10]
+    assert result['Number'].tolist()[:2] == [10, 2] and pd.isna(result['Number'][2])
+    assert result['Nominal'].tolist() == ['b', 'None', 'a', 'nan', 'b']
+
+
 # ---------------------------------------------------------------------------
 # handle_missing_values()
 # ---------------------------------------------------------------------------
@@ -66,6 +83,18 @@ def test_handle_missing_values_na_ignore():
     assert result['Col'].isna().sum() == 0, "'-' should be ignored when in na_ignore"
 
 
+def test_handle_missing_values_case_insensitive_and_patterns():
+    df = pd.DataFrame({'Col': ['N/a', 'A', 'UNKNOWN ', 'n.a.', 'B'],
+                       'Cat': pd.Categorical(['nOnE', 'x', 'x', 'y', '???'])})
+    result, _, _ = pandas_cat.handle_missing_values(df.copy())
+    assert result['Col'].isna().sum() == 0
+    result, detected, counts = pandas_cat.handle_missing_values(
+        df.copy(), na_case_insensitive=True, na_patterns=[r'\?+', r'n\.a\.', r'unknown\s*'])
+    assert result['Col'].isna().sum() == 2
+    assert list(result['Cat'].cat.categories) == ['x', 'y']
+    assert detected['Cat'] == ['???', 'nOnE'] and counts['Cat'] == [1, 1]
+
+
 # ---------------------------------------------------------------------------
 # profile() — default template
 # ---------------------------------------------------------------------------
@@ -78,6 +107,68 @@ def test_profile_default_creates_html_file(tmp_path, monkeypatch):
     assert (tmp_path / "report" / "test_default.html").exists()
 
 
+@pytest.mark.parametrize("backend", ["svg", "matplotlib"])
+def test_profile_default_parallel_rendering_is_identical(tmp_path, monkeypatch, backend):
+    monkeypatch.chdir(tmp_path)
+    opts = {"auto_prepare": False, "chart_backend": backend}
+    pandas_cat.profile(df=make_df(), out_html="serial.html", opts=opts)
+    pandas_cat.profile(df=make_df(), out_html="parallel.html", opts={**opts, "n_jobs": 2})
+    serial = (tmp_path / "report" / "serial.html").read_text()
+    assert serial == (tmp_path / "report" / "parallel.html").read_text()
+
+
+def test_profile_default_client_render_embeds_counts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pandas_cat.profile(df=make_df(), out_html="client.html", opts={"auto_prepare": False, "render": "client"})
+    html = (tmp_path / "report" / "client.html").read_text()
+    assert "const pcCharts" in html
+    assert "data:image/svg+xml;base64" not in html
+
+
+def test_profile_default_chart_backends(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chart = pandas_cat._histogram_chart(["a & b", "c"], [3, 1])
+    svg = base64.b64decode(pandas_cat._render_chart_svg(chart)).decode()
+    assert svg.startswith("<svg") and svg.count("<rect") == 2 and "a &amp; b" in svg
+    charts = []
+    pandas_cat.profile(df=make_df(), out_html="custom.html",
+                       opts={"auto_prepare": False, "chart_backend": lambda chart: charts.append(chart) or ""})
+    assert {chart["kind"] for chart in charts} == {"memory", "histogram", "heatmap"}
+    with pytest.raises(ValueError, match="chart backend"):
+        pandas_cat.profile(df=make_df(), opts={"auto_prepare": False, "chart_backend": "png"})
+
+
+def test_profile_default_chart_cache(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    opts = {"auto_prepare": False, "chart_cache_dir": str(tmp_path / "cache")}
+    pandas_cat.profile(df=make_df(), out_html="first.html", opts=opts)
+    assert "0 hits" in caplog.text
+    caplog.clear()
+    pandas_cat.profile(df=make_df(), out_html="second.html", opts=opts)
+    assert " 0 misses" in caplog.text
+    first = (tmp_path / "report" / "first.html").read_text()
+    assert first == (tmp_path / "report" / "second.html").read_text()
+    # lambdas cannot be told apart by name, named functions are cached by name and code
+    assert pandas_cat_module._ChartCache.name_of(lambda chart: "") is None
+    assert pandas_cat_module._ChartCache.name_of(make_df).startswith(f"{__name__}.make_df ")
+
+
+def test_profile_verbose_false_logs_only_warnings(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    df = make_df()
+    df['Empty'] = None
+    pandas_cat.profile(df=df, out_html="quiet.html", opts={"verbose": False})
+    assert [record.levelname for record in caplog.records] == ["WARNING"]
+    assert "only empty value" in caplog.text
+
+
+def test_prepare_accepts_logging_level_names():
+    for verbose in ("INFO", "warning", logging.DEBUG):
+        pandas_cat.prepare(make_df(), opts={"verbose": verbose})
+    with pytest.raises(ValueError, match="verbose"):
+        pandas_cat.prepare(make_df(), opts={"verbose": "loud"})
+
+
 # ---------------------------------------------------------------------------
 # profile() — interactive template
 # ---------------------------------------------------------------------------
@@ -97,3 +188,374 @@ def test_profile_interactive_autoprepare_false(tmp_path, monkeypatch):
                        out_html="test_interactive_no_prep.html",
                        opts={"auto_prepare": False})
     assert (tmp_path / "report" / "test_interactive_no_prep.html").exists()
+
+
+# ---------------------------------------------------------------------------
+# contingency tables
+# ---------------------------------------------------------------------------
+
+def test_contingency_tables_match_crosstab():
+    from pandas_cat import _ContingencyTables
+    df = make_df()
+    df.loc[2, 'Sex'] = None
+    tables = _ContingencyTables(df)
+    for column_one in df.columns:
+        for column_two in df.columns:
+            expected = pd.crosstab(df[column_one], df[column_two])
+            result = tables.crosstab(column_one, column_two)
+            assert result.values.tolist() == expected.values.tolist()
+            assert list(result.index) == list(expected.index)
+
+
+# ---------------------------------------------------------------------------
+# association_matrix()
+# ---------------------------------------------------------------------------
+
+def test_association_matrix_matches_pairwise_cramers_v():
+    df = make_df()
+    result = pandas_cat.association_matrix(df, metric="cramers_v")
+    assert list(result.index) == list(df.columns)
+    for column_one in df.columns:
+        for column_two in df.columns:
+            expected = pandas_cat._cramers_corrected_stat(pd.crosstab(df[column_one], df[column_two]))
+            assert result.loc[column_one, column_two] == pytest.approx(expected)
+
+
+def test_association_matrix_unknown_metric():
+    with pytest.raises(ValueError):
+        pandas_cat.association_matrix(make_df(), metric="unknown")
+
+
+def test_association_matrix_rejects_columns_over_cat_limit():
+    df = pd.DataFrame({'Id': [f'id{i}' for i in range(30)], 'Sex': ['Male', 'Female'] * 15})
+    with pytest.raises(ValueError, match=r"\['Id'\]"):
+        pandas_cat.association_matrix(df)
+    assert pandas_cat.association_matrix(df, cat_limit=None).shape == (2, 2)
+
+
+# ---------------------------------------------------------------------------
+# Theil's U
+# ---------------------------------------------------------------------------
+
+def test_theils_u_returns_both_directions():
+    df = make_df()
+    u_xy, u_yx = pandas_cat._theils_u(df['Age'], df['Sex'])
+    u_yx2, u_xy2 = pandas_cat._theils_u(df['Sex'], df['Age'])
+    assert u_xy == pytest.approx(u_xy2)
+    assert u_yx == pytest.approx(u_yx2)
+    assert pandas_cat._theils_u(df['Age'], df['Age'])[0] == pytest.approx(1)
+
+
+def test_theils_u_missing_as_category():
+    x = pd.Series(['a', 'a', 'b', 'b'])
+    y = pd.Series(['p', 'p', None, None])
+    assert pandas_cat._theils_u(x, y)[0] == 0
+    assert pandas_cat._theils_u(x, y, dropna=False)[0] == pytest.approx(1)
+
+
+# ---------------------------------------------------------------------------
+# profile_state() / update()
+# ---------------------------------------------------------------------------
+
+def test_update_matches_state_of_all_rows():
+    df = make_df_with_missing()
+    opts = {"auto_prepare": False}
+    full = pandas_cat.profile_state(df.copy(), opts)
+    state = pandas_cat.update(pandas_cat.profile_state(df.iloc[:2].copy(), opts), df.iloc[2:].copy())
+    assert state.n_rows == full.n_rows
+    for column in df.columns:
+        assert state.missing[column] == full.missing[column]
+        assert state.detected[column] == full.detected[column]
+        assert dict(zip(state.categories[column], state.counts[column])) == \
+            dict(zip(full.categories[column], full.counts[column]))
+    pd.testing.assert_frame_equal(pandas_cat.association_matrix(state), pandas_cat.association_matrix(full))
+
+
+def test_update_keeps_no_categories_of_excluded_columns():
+    df = pd.DataFrame({'Id': [f'id{i}' for i in range(60)], 'Sex': ['Male', 'Female'] * 30})
+    opts = {"auto_prepare": False, "cat_limit": 5}
+    state = pandas_cat.update(pandas_cat.profile_state(df.head(30), opts), df.tail(30))
+    assert state.excluded == ['Id'] and state.categories['Id'] == [] and state.distinct['Id'] == 30
+    assert ProfileState.from_dict(state.to_dict()).distinct == state.distinct
+    assert ColumnProfile(state, 'Id').n_categories == 30
+
+
+def test_update_different_columns():
+    state = pandas_cat.profile_state(make_df())
+    with pytest.raises(ValueError):
+        pandas_cat.update(state, make_df_with_missing())
+
+
+def test_profile_state_save_and_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    state = pandas_cat.profile_state(make_df())
+    state.save(str(tmp_path / "state.json"))
+    loaded = ProfileState.load(str(tmp_path / "state.json"))
+    assert loaded.to_dict() == state.to_dict()
+    pandas_cat.profile(df=make_df(), dataset_name="Test", out_html="from_df.html")
+    pandas_cat.profile(df=loaded, dataset_name="Test", out_html="from_state.html")
+    assert (tmp_path / "report" / "from_df.html").read_text() == \
+        (tmp_path / "report" / "from_state.html").read_text()
+
+
+def test_profile_file_matches_in_memory_counts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = make_df_with_missing()
+    df.to_csv(tmp_path / "data.csv", index=False)
+    state = pandas_cat.profile_file(str(tmp_path / "data.csv"), dataset_name="Test", out_html="file.html",
+                                    opts={"auto_prepare": False}, chunksize=2)
+    expected = pandas_cat.profile_state(df, {"auto_prepare": False})
+    assert state.n_rows == len(df)
+    for column in df.columns:
+        assert state.categories[column] == expected.categories[column]
+        assert list(state.counts[column]) == list(expected.counts[column])
+        assert state.detected[column] == expected.detected[column]
+    assert (tmp_path / "report" / "file.html").exists()
+
+
+def test_profile_file_orders_categories_as_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = make_df_with_missing()
+    df.to_csv(tmp_path / "data.csv", index=False)
+    state = pandas_cat.profile_file(str(tmp_path / "data.csv"), dataset_name="Test", out_html="file.html", chunksize=2)
+    expected = pandas_cat.profile_state(df.copy())
+    for column in df.columns:
+        # 'Unknown' in Age is a value when prepare() orders the categories, so it keeps Age unordered
+        assert state.ordered[column] == expected.ordered[column]
+        assert state.categories[column] == expected.categories[column]
+    numeric = pd.DataFrame({'Age': ['0-10', '21-30', 'NA', '11-20', '21-30']})
+    numeric.to_csv(tmp_path / "numeric.csv", index=False)
+    state = pandas_cat.profile_file(str(tmp_path / "numeric.csv"), out_html="numeric.html", chunksize=2)
+    assert state.ordered['Age'] and state.categories['Age'] == pandas_cat.profile_state(numeric).categories['Age']
+
+
+def test_merge_serialized_shard_states():
+    df = make_df_with_missing()
+    opts = {"auto_prepare": False}
+    shards = [ProfileState.from_dict(pandas_cat.profile_state(df.iloc[i:i + 2].copy(), opts).to_dict())
+              for i in range(0, len(df), 2)]
+    merged = ProfileState.merge_all(shards)
+    expected = pandas_cat.profile_state(df.copy(), opts)
+    for column in df.columns:
+        assert merged.categories[column] == expected.categories[column]
+        assert list(merged.counts[column]) == list(expected.counts[column])
+    assert (merged.table("Age", "Sex") == expected.table("Age", "Sex")).all()
+
+
+def test_profile_state_sharded_matches_serial():
+    df = make_df()
+    serial = pandas_cat.profile_state(df.copy())
+    sharded = pandas_cat.profile_state(df.copy(), {"n_jobs": 2})
+    assert sharded.to_dict() == serial.to_dict()
+
+
+def test_profile_state_memory_as_pandas_reports():
+    df = pandas_cat.prepare(make_df())
+    state = pandas_cat.profile_state(df, {"auto_prepare": False})
+    assert state.memory == df.memory_usage(deep=True, index=False).to_dict()
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_profile_state_memory_after_missing_values(n_jobs):
+    df = make_df_with_missing()
+    df['Count'] = [1, -1, 2, 3, -1]
+    df['Sex'] = df['Sex'].astype('category')
+    options = {"auto_prepare": False, "na_values": [-1], "n_jobs": n_jobs}
+    state = pandas_cat.profile_state(df.copy(), options)
+    replaced, _, _ = pandas_cat.handle_missing_values(df.copy(), na_values=[-1])
+    assert state.memory == replaced.memory_usage(deep=True, index=False).to_dict()
+
+
+def test_column_profile_statistics():
+    df = pd.DataFrame({'Sex': ['Male', 'Female', 'Male', 'NA', 'Male']})
+    column = ColumnProfile(pandas_cat.profile_state(df, {"auto_prepare": False}), 'Sex')
+    assert column.n_categories == 3
+    assert column.missing == 1 and column.missing_percentage == pytest.approx(20)
+    assert column.extreme(column.most_frequent) == ('Male', 3, pytest.approx(60))
+    assert column.extreme(column.least_frequent) == ('Female', 1, pytest.approx(20))
+    assert [column.categories[k] for k in column.order()] == ['Male', 'Female']
+
+
+def test_contingency_codes_matrix_is_compact():
+    from pandas_cat import _ContingencyTables
+    tables = _ContingencyTables(make_df_with_missing())
+    assert tables.codes.dtype == 'int8' and tables.codes.flags['C_CONTIGUOUS']
+    assert tables.codes.shape == (2, 5)
+    assert list(tables.column_codes('Age')) == [0, 4, 1, 3, 2]
+
+
+def test_sampled_state_lists_rare_categories_with_intervals():
+    df = pd.DataFrame({'Sex': ['Male', 'Female'] * 500, 'Age': ['10-20', '20-30', '30-40', 'NA'] * 250})
+    # row 3 is not in the sample drawn with the default seed
+    df.loc[3, 'Sex'] = 'Other'
+    state = pandas_cat.profile_state(df, {"sample": 100, "verbose": False})
+    assert state.n_rows == 100 and state.population == 1000
+    column = ColumnProfile(state, 'Sex')
+    assert 'Other' in [column.categories[k] for k in column.observed]
+    assert state.unsampled['Sex'] == ['Other']
+    lower, upper = column.intervals.T
+    assert (lower <= column.percentages).all() and (column.percentages <= upper).all()
+    assert ColumnProfile(state, 'Age').ordered
+    with pytest.raises(ValueError):
+        pandas_cat.update(state, df.head())
+    assert ProfileState.from_dict(state.to_dict()).unsampled == state.unsampled
+
+
+def test_profile_sample_reports_intervals(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pandas_cat.profile(df=make_df(), dataset_name="Test", out_html="sample.html", opts={"sample": 0.5})
+    assert "sampled of" in (tmp_path / "report" / "sample.html").read_text()
+    pandas_cat.profile(df=make_df(), dataset_name="Test", template="interactive", out_html="sample_i.html",
+                       opts={"sample": 3})
+    assert '"intervals": {"Cramers V": [null, null, ' in (tmp_path / "report" / "sample_i.html").read_text()
+
+
+def test_high_cardinality_other_bucket():
+    df = pd.DataFrame({'Id': [f'id{i % 12}' if i % 3 else 'id0' for i in range(60)], 'Sex': ['Male', 'Female'] * 30})
+    opts = {"auto_prepare": False, "cat_limit": 5, "high_cardinality": "other"}
+    state = pandas_cat.profile_state(df, opts)
+    assert state.categories['Id'][0] == 'id0' and state.categories['Id'][-1] == ProfileState.other_category
+    assert len(state.categories['Id']) == 5 and state.counts['Id'].sum() == 60
+    assert 'Id' not in state.excluded and 'Id' in state.bucketed
+    assert 'Id' in pandas_cat.association_matrix(state).columns
+    merged = pandas_cat.update(pandas_cat.profile_state(df.head(30), opts), df.tail(30))
+    assert len(merged.categories['Id']) == 5 and merged.table('Id', 'Sex').sum() == 60
+
+
+def test_high_cardinality_other_keeps_input_and_stops_counting(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({'Id': [f'id{i % 7}' if i % 2 else f'u{i}' for i in range(400)], 'Sex': ['Male', 'Female'] * 200})
+    original = df.copy()
+    pandas_cat.profile(df, "Test", out_html="other.html", opts={"cat_limit": 5, "high_cardinality": "other"})
+    # prepare() may convert the columns to categorical, but keeps their values
+    assert df['Id'].astype(str).tolist() == original['Id'].tolist()
+    # exact counting stops after the first block of 50 records, the frequent values are still found
+    monkeypatch.setattr(ProfileState, 'block_rows', 50)
+    state = ProfileState.from_frame(df, {"cat_limit": 5, "high_cardinality": "other"})
+    exact = df['Id'].value_counts()
+    assert set(state.categories['Id'][:-1]) == set(exact.index[:4])
+    assert list(state.counts['Id'][:-1]) == sorted(exact.iloc[:4], reverse=True)
+    assert state.bucketed['Id'] >= exact.iloc[4] and state.table('Id', 'Sex').sum() == 400
+
+
+def test_profile_trace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    traces = []
+    trace = pandas_cat.profile(df=make_df(), dataset_name="Test", out_html="trace.html",
+                               opts={"render": "client", "trace": traces.append})
+    assert traces == [trace]
+    stages = [stage['stage'] for stage in trace.stages]
+    assert stages[0] == 'prepare' and stages[-1] == 'write' and 'render_charts' in stages
+    assert len(trace.pairs) == 9 and trace.charts['embedded'] == 3 + 1 + 9
+    assert sum(trace.sections.values()) == (tmp_path / "report" / "trace.html").stat().st_size
+    assert trace.to_dict()['seconds'] == pytest.approx(trace.seconds)
+    assert pandas_cat.profile(df=make_df(), dataset_name="Test", out_html="trace.html") is None
+
+
+def test_compute_profile_renders_both_templates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = pandas_cat.compute_profile(make_df(), opts={"auto_prepare": False, "verbose": False})
+    assert isinstance(result, ProfileResult)
+    pd.testing.assert_frame_equal(result.cramers_v, pandas_cat.association_matrix(make_df()))
+    html = pandas_cat.render_html(result, dataset_name="Test", out_html="default.html")
+    assert html == (tmp_path / "report" / "default.html").read_text()
+    pandas_cat.profile(df=make_df(), dataset_name="Test", out_html="profile.html", opts={"auto_prepare": False})
+    assert html == (tmp_path / "report" / "profile.html").read_text()
+    assert "Theils U" in pandas_cat.render_html(result, dataset_name="Test", template="interactive")
+    data = json.loads(json.dumps(result.to_dict()))
+    assert [column['name'] for column in data['columns']] == ['Age', 'Sex', 'Vehicle_Age']
+    assert data['associations']['cramers_v'] == result.cramers_v.to_numpy().tolist()
+
+
+def test_profile_interactive_columnar_correlations(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = pandas_cat.compute_profile(make_df(), opts={"auto_prepare": False, "verbose": False})
+    html = pandas_cat.render_html(result, template="interactive")
+    assert '"x": "Age"' not in html and '"crosstabs": {"categories": [["0-10", "11-20", "21-30"]' in html
+    compressed = pandas_cat.render_html(result, template="interactive", opts={"compress_crosstabs": True})
+    assert '"dtype": "uint32"' in compressed
+
+
+def test_profile_target_computes_only_selected_pairs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    opts = {"auto_prepare": False, "verbose": False}
+    full = pandas_cat.compute_profile(make_df(), opts=opts)
+    result = pandas_cat.compute_profile(make_df(), opts={**opts, "target": "Sex"})
+    assert result.pairs == [("Age", "Sex"), ("Sex", "Vehicle_Age")]
+    assert set(result.state.tables) == set(result.pairs)
+    assert pd.isna(result.cramers_v.loc["Age", "Vehicle_Age"])
+    assert result.theils_u.loc["Age", "Sex"] == pytest.approx(full.theils_u.loc["Age", "Sex"])
+    assert result.to_dict()["associations"]["spearman"][0][2] is None
+    assert '"pairs": [0, 1, 1, 2]' in pandas_cat.render_html(result, template="interactive")
+    assert "Age x Vehicle_Age" not in pandas_cat.render_html(result)
+    with pytest.raises(ValueError, match="different pairs"):
+        pandas_cat.profile_state(make_df(), opts).merge(result.state)
+    with pytest.raises(ValueError, match="Unknown columns"):
+        pandas_cat.compute_profile(make_df(), opts={**opts, "target": "Severity"})
+
+
+def test_profile_async_progress_and_cancel(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        job = pandas_cat.profile_async(make_df(), "Test", out_html="async.html", opts={"trace": True})
+        progress = [item async for item in job]
+        trace = await job
+        cancelled = pandas_cat.profile_async(make_df(), "Test", out_html="cancelled.html")
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return job, progress, trace
+
+    job, progress, trace = asyncio.run(run())
+    assert [item['stage'] for item in progress] == [stage['stage'] for stage in trace.stages] == job.stages
+    assert progress[-1]['step'] == progress[-1]['steps'] == len(job.stages)
+    assert (tmp_path / "report" / "async.html").exists()
+    assert not (tmp_path / "report" / "cancelled.html").exists()
+
+
+def test_profile_async_leaves_logger_unchanged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    logger = logging.getLogger('pandas_cat')
+    level, handlers = logger.level, list(logger.handlers)
+    # jobs run in threads, switching the shared logger there would affect other jobs
+    levels = []
+    monkeypatch.setattr(logger, 'setLevel', levels.append)
+
+    async def run():
+        await asyncio.gather(pandas_cat.profile_async(make_df(), "Test", out_html="a.html"),
+                             pandas_cat.profile_async(make_df(), "Test", out_html="b.html", opts={"sample": 3}))
+
+    asyncio.run(run())
+    assert levels == [] and logger.level == level and logger.handlers == handlers
+
+
+def test_profile_many_and_cli(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_df().to_csv(tmp_path / "accidents.csv", index=False)
+    results = pandas_cat.profile_many([tmp_path / "accidents.csv", make_df(), 42], template="interactive",
+                                      opts={"auto_prepare": False, "verbose": False})
+    assert [result['dataset'] for result in results] == ["accidents", "dataset_2", "dataset_3"]
+    assert [result['error'] is None for result in results] == [True, True, False]
+    assert "TypeError" in results[2]['error']
+    assert (tmp_path / "report" / "accidents.html").exists() and (tmp_path / "report" / "dataset_2.html").exists()
+    assert pandas_cat_module.main([str(tmp_path / "accidents.csv"), "--template", "interactive", "--quiet"]) == 0
+    assert pandas_cat_module.main([str(tmp_path / "missing.csv"), "--quiet"]) == 1
+
+
+def test_import_is_lightweight():
+    # fresh interpreters, modules imported by earlier tests do not count
+    src = os.path.join(os.path.dirname(__file__), "..", "src")
+    code = ("import sys, time; start = time.perf_counter(); import {module}; seconds = time.perf_counter() - start; "
+            "print(seconds, *[m for m in ('matplotlib', 'seaborn', 'scipy', 'cleverminer') if m in sys.modules])")
+
+    def run(module):
+        out = subprocess.run([sys.executable, "-c", code.format(module=module)], env={**os.environ, "PYTHONPATH": src},
+                             capture_output=True, text=True, check=True).stdout.split()
+        return float(out[0]), out[1:]
+
+    pandas_seconds, _ = run("pandas")
+    seconds, heavy = run("pandas_cat")
+    assert heavy == []
+    # plotting and statistics stacks alone take seconds
+    assert seconds - pandas_seconds < 1.0